@@ -2,12 +2,184 @@
 AI-powered error analysis using Groq.
 Loads system context and user prompt from external files.
 """
+import asyncio
+import functools
 import json
 import os
 import re
 from pathlib import Path
-from typing import Dict, Any
-from groq import Groq
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import llm_cache
+from groq_client import (
+    JSON_MODE_MODELS, MAX_CONCURRENCY, STOP_SEQUENCES, acreate_completion, create_completion, get_client, max_tokens_for,
+    output_format
+)
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Nom d'exception Python (SyntaxError, ValueError, MyCustomException...)
+_EXCEPTION_NAME_RE = re.compile(r"\b\w*(?:Error|Exception)\b")
+
+# Espacement superflu des fichiers de prompt
+_INNER_SPACES_RE = re.compile(r"(?<=\S) {2,}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+# Relance quand la réponse du modèle n'est pas un JSON valide
+_REPAIR_PROMPT = (
+    "Ta réponse précédente n'est pas un JSON valide. Renvoie uniquement l'objet JSON "
+    "demandé, strictement valide, sans aucun texte autour."
+)
+
+# Consigne ajoutée au prompt quand plusieurs scripts sont analysés ensemble
+_BATCH_INSTRUCTIONS = (
+    "Les scripts ci-dessus sont indépendants : analyse chacun séparément. "
+    'Renvoie un JSON strict de la forme {"results": [{"id": id_du_script, ...}]}, '
+    "avec un résultat par script, chacun respectant le format suivant."
+)
+
+
+class _JsonObjectScanner:
+    """Tracks brace depth over streamed text, ignoring braces inside JSON strings."""
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> int:
+        """
+        Consume a piece of text.
+        
+        Returns:
+            Index just past the brace closing the outer object, or -1
+        """
+        for i, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == "{":
+                self.depth += 1
+            elif self.depth == 0:
+                continue
+            elif char == '"':
+                self.in_string = True
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+
+def _find_json_object(text: str) -> Optional[str]:
+    """Locate the outer JSON object in text with a single left-to-right pass."""
+    end = _JsonObjectScanner().feed(text)
+    if end == -1:
+        return None
+    return text[text.find("{"):end]
+
+
+def _extract_json(content: str) -> Dict[str, Any]:
+    """Parse the JSON object from a model response, with or without surrounding prose."""
+    json_str = _find_json_object(content)
+    return _json.loads(json_str if json_str is not None else content)
+
+
+def _repair_messages(messages: List[Dict[str, str]], content: str) -> List[Dict[str, str]]:
+    """Conversation asking the model to resend its answer as valid JSON."""
+    return messages + [
+        {"role": "assistant", "content": content},
+        {"role": "user", "content": _REPAIR_PROMPT}
+    ]
+
+
+def _detect_error_type(traceback: str) -> str:
+    """Name of the exception reported last in the traceback, or "Unknown"."""
+    for line in reversed(traceback.splitlines()):
+        match = _EXCEPTION_NAME_RE.search(line)
+        if match:
+            return match.group(0)
+    return "Unknown"
+
+
+def _local_result(error_type: str, analysis: str, not_related_to_code: str = "") -> Dict[str, Any]:
+    """Build an analysis result without calling the model."""
+    return {
+        "error_type": error_type,
+        "analysis": analysis,
+        "is_code_bug": False,
+        "lines_to_delete": [],
+        "lines_to_add": [],
+        "not_related_to_code": not_related_to_code
+    }
+
+
+def _read_json_stream(stream, on_chunk: Optional[Callable[[str], None]] = None) -> Tuple[str, Optional[str]]:
+    """
+    Accumulate a streamed completion, stopping as soon as the outer JSON object closes.
+    
+    Args:
+        stream: Chunk stream returned with stream=True
+        on_chunk: Called with the text received so far after each chunk
+    
+    Returns:
+        The text and the finish reason ("length" if max_tokens cut it off;
+        None when reading stopped at the end of the object)
+    """
+    scanner = _JsonObjectScanner()
+    parts = []
+    finish_reason = None
+    try:
+        for chunk in stream:
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            end = scanner.feed(delta)
+            parts.append(delta if end == -1 else delta[:end])
+            if on_chunk is not None:
+                on_chunk("".join(parts))
+            if end != -1:
+                break
+    finally:
+        stream.close()
+    return "".join(parts), finish_reason
+
+
+def _repair_budget(max_tokens: int, finish_reason: Optional[str]) -> int:
+    """Token budget for the repair request: doubled if the answer was cut off."""
+    return 2 * max_tokens if finish_reason == "length" else max_tokens
+
+
+def _compact_prompt(text: str) -> str:
+    """
+    Drop whitespace that costs tokens without carrying meaning.
+    
+    Trailing spaces go, runs of spaces inside a line become one and runs of
+    blank lines become one; leading indentation (lists, JSON example) stays.
+    """
+    text = "\n".join(_INNER_SPACES_RE.sub(" ", line.rstrip()) for line in text.splitlines())
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+# Prompt files ship next to this module, wherever the agent is run from
+_PROMPT_DIR = Path(__file__).resolve().parent
+
+
+@functools.lru_cache(maxsize=8)
+def _load_prompt(path: str) -> str:
+    """Read and compact a prompt file once per process ("" if it does not exist)."""
+    try:
+        return _compact_prompt(Path(path).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return ""
 
 
 class AIAnalyzer:
@@ -27,55 +199,243 @@ class AIAnalyzer:
         if not self.api_key:
             raise ValueError("GROQ_API_KEY environment variable not set")
         
-        self.client = Groq(api_key=self.api_key)
+        self.client = get_client(self.api_key)
+        # Client async et sémaphore, créés dans la boucle d'événements qui les utilise
+        self._loop = None
+        self._aclient = None
+        self._sem = None
         self.model = "llama-3.3-70b-versatile"
         
-        self.system_prompt = self._load_file("context.txt")
-        self.user_prompt_template = self._load_file("prompt.txt")
+        self.system_prompt = _load_prompt(str(_PROMPT_DIR / "context.txt"))
+        self.user_prompt_template = _load_prompt(str(_PROMPT_DIR / "prompt.txt"))
+        # Message utilisateur prêt à formater (les accolades du JSON d'exemple sont échappées)
+        escaped_template = self.user_prompt_template.replace("{", "{{").replace("}", "}}")
+        self._user_tmpl = "CODE SOURCE:\n{src}\n\nERREUR:\n{tb}\n\n" + escaped_template
     
-    def _load_file(self, filename: str) -> str:
-        """Load content from a text file."""
-        path = Path(filename)
-        if not path.exists():
-            return ""
-        with open(path, 'r', encoding='utf-8') as f:
-            return f.read()
+    def _precheck(self, traceback: str) -> Optional[Dict[str, Any]]:
+        """Local result when the error output needs no model call, else None."""
+        # Pas de traceback Python : inutile d'interroger le modèle
+        if not traceback.strip():
+            return _local_result("None", "Aucune erreur à analyser.")
+        if "Traceback" not in traceback and not _EXCEPTION_NAME_RE.search(traceback):
+            return _local_result(
+                "External",
+                "La sortie d'erreur ne contient pas de traceback Python : le problème ne vient probablement pas du code.",
+                f"Vérifier l'environnement d'exécution (interpréteur, permissions, ressources) :\n{traceback.strip()}"
+            )
+        return None
     
-    def analyze(self, source_code: str, traceback: str) -> Dict[str, Any]:
-        """Analyse une erreur et propose des corrections."""
-        user_prompt = f"""CODE SOURCE:
-{source_code}
-
-ERREUR:
-{traceback}
-
-{self.user_prompt_template}"""
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.2,
-            max_tokens=2000
-        )
-        
-        content = response.choices[0].message.content
-        
-        # Extraire et parser le JSON
-        json_str = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_str:
-            result = json.loads(json_str.group(0))
-        else:
-            result = json.loads(content)
-        
-        # Formater la réponse
+    def _format_result(self, result: Dict[str, Any], traceback: str) -> Dict[str, Any]:
+        """Convert a model answer (delete/add/explanations) to the analysis format."""
         return {
-            "error_type": result.get("error_type", "Unknown"),
+            "error_type": result.get("error_type") or _detect_error_type(traceback),
             "analysis": "\n".join(result.get("explanations", [])),
             "is_code_bug": len(result.get("delete", [])) > 0 or len(result.get("add", [])) > 0,
             "lines_to_delete": [{"line_number": item.get("line"), "content": item.get("content"), "explanation": ""} for item in result.get("delete", [])],
             "lines_to_add": [{"line_number": item.get("line"), "content": item.get("content"), "explanation": ""} for item in result.get("add", [])],
             "not_related_to_code": "\n".join(result.get("not_related_to_code", []))
         }
+    
+    def analyze(self, source_code: str, traceback: str, no_cache: bool = False,
+                on_chunk: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Analyse une erreur et propose des corrections (réponses mises en cache sauf si no_cache).
+        
+        on_chunk reçoit la réponse partielle du modèle au fil du streaming
+        (pas d'appel si la réponse vient du cache).
+        """
+        local = self._precheck(traceback)
+        if local is not None:
+            return local
+        
+        user_prompt = self._user_tmpl.format(src=source_code, tb=traceback)
+        
+        cache_key = llm_cache.make_key(self.system_prompt, user_prompt, self.model)
+        if not no_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        response = create_completion(
+            self.client,
+            model=self.model,
+            messages=messages,
+            temperature=0,
+            max_tokens=max_tokens_for(source_code),
+            stop=STOP_SEQUENCES,
+            stream=True
+        )
+        
+        content, finish_reason = _read_json_stream(response, on_chunk)
+        try:
+            result = _extract_json(content)
+        except ValueError:
+            result = self._retry_with_repair(messages, content, _repair_budget(max_tokens_for(source_code), finish_reason))
+        
+        analysis = self._format_result(result, traceback)
+        llm_cache.put(cache_key, analysis)
+        return analysis
+    
+    def _retry_with_repair(self, messages: List[Dict[str, str]], content: str, max_tokens: int) -> Dict[str, Any]:
+        """
+        Ask once more for a valid JSON object after an unparseable answer.
+        
+        Raises:
+            ValueError: If the new answer is not valid JSON either
+        """
+        response = create_completion(
+            self.client,
+            model=self.model,
+            messages=_repair_messages(messages, content),
+            temperature=0,
+            max_tokens=max_tokens,
+            **output_format(self.model)
+        )
+        return _extract_json(response.choices[0].message.content)
+    
+    async def _aretry_with_repair(self, aclient, messages: List[Dict[str, str]], content: str,
+                                  max_tokens: int) -> Dict[str, Any]:
+        """Async version of _retry_with_repair."""
+        response = await acreate_completion(
+            aclient,
+            model=self.model,
+            messages=_repair_messages(messages, content),
+            temperature=0,
+            max_tokens=max_tokens,
+            **output_format(self.model)
+        )
+        return _extract_json(response.choices[0].message.content)
+    
+    def _async_state(self):
+        """AsyncGroq client and concurrency semaphore bound to the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            from groq import AsyncGroq
+            self._aclient = AsyncGroq(api_key=self.api_key, max_retries=0)
+            self._sem = asyncio.Semaphore(MAX_CONCURRENCY)
+            self._loop = loop
+        return self._aclient, self._sem
+    
+    async def aanalyze(self, source_code: str, traceback: str, no_cache: bool = False) -> Dict[str, Any]:
+        """
+        Version async d'analyze.
+        
+        Au plus MAX_CONCURRENCY requêtes (GROQ_MAX_CONCURRENCY) sont envoyées
+        en même temps : les analyses lancées avec asyncio.gather attendent
+        leur tour au lieu de déclencher des erreurs 429.
+        """
+        local = self._precheck(traceback)
+        if local is not None:
+            return local
+        
+        user_prompt = self._user_tmpl.format(src=source_code, tb=traceback)
+        
+        cache_key = llm_cache.make_key(self.system_prompt, user_prompt, self.model)
+        if not no_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        aclient, sem = self._async_state()
+        async with sem:
+            response = await acreate_completion(
+                aclient,
+                model=self.model,
+                messages=messages,
+                temperature=0,
+                max_tokens=max_tokens_for(source_code),
+                **output_format(self.model)
+            )
+            content = response.choices[0].message.content
+            try:
+                # En mode JSON, la réponse est l'objet lui-même
+                result = _json.loads(content) if self.model in JSON_MODE_MODELS else _extract_json(content)
+            except ValueError:
+                result = await self._aretry_with_repair(
+                    aclient, messages, content,
+                    _repair_budget(max_tokens_for(source_code), response.choices[0].finish_reason)
+                )
+        
+        analysis = self._format_result(result, traceback)
+        llm_cache.put(cache_key, analysis)
+        return analysis
+    
+    def analyze_many(self, items: List[Tuple[str, str]], no_cache: bool = False) -> List[Dict[str, Any]]:
+        """
+        Analyse plusieurs erreurs indépendantes avec une seule requête au modèle.
+        
+        Les éléments résolus sans le modèle (pas de traceback, réponse en cache)
+        ne sont pas envoyés, les doublons (même code, même traceback) ne le
+        sont qu'une fois ; un élément absent de la réponse groupée est
+        analysé seul avec analyze.
+        
+        Args:
+            items: Couples (code source numéroté, traceback)
+            no_cache: Ignorer les réponses en cache
+            
+        Returns:
+            Une analyse par élément, dans l'ordre de items
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        first_index = {}
+        duplicates = []
+        for i, (source_code, traceback) in enumerate(items):
+            results[i] = self._precheck(traceback)
+            if results[i] is not None:
+                continue
+            user_prompt = self._user_tmpl.format(src=source_code, tb=traceback)
+            cache_key = llm_cache.make_key(self.system_prompt, user_prompt, self.model)
+            if not no_cache:
+                results[i] = llm_cache.get(cache_key)
+                if results[i] is not None:
+                    continue
+            if cache_key in first_index:
+                duplicates.append((i, first_index[cache_key]))
+                continue
+            first_index[cache_key] = i
+            pending.append((i, cache_key))
+        
+        if len(pending) == 1:
+            i, _ = pending[0]
+            results[i] = self.analyze(*items[i], no_cache=no_cache)
+        elif pending:
+            batch = [{"id": i, "code": items[i][0], "traceback": items[i][1]} for i, _ in pending]
+            user_prompt = f"SCRIPTS:\n{json.dumps(batch, ensure_ascii=False)}\n\n{_BATCH_INSTRUCTIONS}\n\n{self.user_prompt_template}"
+            response = create_completion(
+                self.client,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=0,
+                max_tokens=sum(max_tokens_for(items[i][0]) for i, _ in pending),
+                stop=STOP_SEQUENCES,
+                stream=True
+            )
+            try:
+                answers = _extract_json(_read_json_stream(response)[0]).get("results", [])
+            except ValueError:
+                # Réponse groupée illisible : chaque élément sera analysé seul
+                answers = []
+            by_id = {answer.get("id"): answer for answer in answers if isinstance(answer, dict)}
+            
+            for i, cache_key in pending:
+                if i in by_id:
+                    results[i] = self._format_result(by_id[i], items[i][1])
+                    llm_cache.put(cache_key, results[i])
+                else:
+                    results[i] = self.analyze(*items[i], no_cache=no_cache)
+        
+        for i, first in duplicates:
+            results[i] = dict(results[first])
+        return results
@@ -1,70 +1,149 @@
 """
 Minimal debugging agent that reads external prompts and context.
 """
+import io
 import os
-import json
+import shutil
 import subprocess
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from groq import Groq
-from dotenv import load_dotenv
+import llm_cache
+from executor import SCRIPT_TIMEOUT, _OutputTail
+from groq_client import create_completion, get_client, max_tokens_for, output_format
 from config import BOLD, BLUE, RED, GREEN, YELLOW, RESET
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Interpreter locations inside a virtualenv, current platform first
+if os.name == "nt":
+    VENV_PYTHON_CANDIDATES = (("Scripts", "python.exe"), ("bin", "python"), ("bin", "python3"))
+else:
+    VENV_PYTHON_CANDIDATES = (("bin", "python"), ("bin", "python3"), ("Scripts", "python.exe"))
+
 
 class DebuggerAgent:
+    # Interpreter found for each virtualenv path, shared by all agents
+    _venv_python_cache = {}
+    
     def __init__(self, project_path, env_name, script_name):
+        # Imported lazily to keep module import cheap
+        from dotenv import load_dotenv
+        
         load_dotenv()
         self.project_path = project_path
         self.env_name = env_name
         self.script_name = script_name
         self.script_path = os.path.join(project_path, script_name)
-        self.client = Groq()
+        self.python_executable = self._find_python_executable()
+        self.client = get_client(os.getenv("GROQ_API_KEY"))
+        self.model = "mixtral-8x7b-32768"
+        self._source = None
         
         self.system_prompt = self._load_file("prompt.txt")
         self.context = self._load_file("context.txt")
     
     def _load_file(self, filename):
         """Load content from external file."""
-        path = Path(__file__).resolve().parent / filename
-        if path.exists():
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read()
-        return ""
+        try:
+            return (Path(__file__).resolve().parent / filename).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return ""
+    
+    def _find_python_executable(self):
+        """
+        Use the project's virtualenv interpreter if present, else the current one.
+        
+        Found interpreters are remembered per venv path; a missing venv is
+        probed again next time, in case it has been created since.
+        """
+        venv_path = os.path.join(self.project_path, self.env_name)
+        cached = self._venv_python_cache.get(venv_path)
+        if cached is not None:
+            return cached
+        for parts in VENV_PYTHON_CANDIDATES:
+            candidate = os.path.join(venv_path, *parts)
+            if os.path.isfile(candidate):
+                self._venv_python_cache[venv_path] = candidate
+                return candidate
+        return sys.executable
     
     def _execute_script(self):
-        """Execute script and capture output/errors."""
+        """
+        Execute script and capture output/errors.
+        
+        Output is read as bytes while it is produced, keeping the last lines
+        within executor's bounds, and decoded once at the end.
+        """
         try:
-            result = subprocess.run(
-                ["python", self.script_path],
-                capture_output=True,
-                text=True,
-                timeout=10
+            process = subprocess.Popen(
+                [self.python_executable, self.script_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
             )
+        except Exception as e:
             return {
-                "success": result.returncode == 0,
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "traceback": result.stderr
+                "success": False,
+                "stdout": "",
+                "stderr": str(e),
+                "traceback": str(e)
             }
+        
+        # Last lines only: the traceback is at the end of stderr
+        stdout_tail = _OutputTail()
+        stderr_tail = _OutputTail()
+        readers = [
+            threading.Thread(target=stdout_tail.read, args=(process.stdout,), daemon=True),
+            threading.Thread(target=stderr_tail.read, args=(process.stderr,), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
+        
+        # A printed traceback is not a crash by itself (traceback.print_exc,
+        # logging.exception): only the exit or the timeout ends the run
+        try:
+            process.wait(timeout=SCRIPT_TIMEOUT)
+            timed_out = False
         except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            timed_out = True
+        
+        for reader in readers:
+            reader.join(timeout=1)
+        
+        if timed_out:
             return {
                 "success": False,
                 "stdout": "",
                 "stderr": "Script execution timed out",
                 "traceback": "Script execution timed out"
             }
-        except Exception as e:
-            return {
-                "success": False,
-                "stdout": "",
-                "stderr": str(e),
-                "traceback": str(e)
-            }
+        
+        stderr = stderr_tail.text()
+        return {
+            "success": process.returncode == 0,
+            "stdout": stdout_tail.text(),
+            "stderr": stderr,
+            "traceback": stderr
+        }
     
     def _get_numbered_source(self):
-        """Get source code with line numbers."""
+        """Get source code with line numbers, along with the raw source."""
         with open(self.script_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        return "\n".join(f"{i+1:3d} | {line.rstrip()}" for i, line in enumerate(lines))
+            source = f.read()
+        # split("\n") rather than splitlines(), which also breaks at form
+        # feeds, \u2028... and would shift the numbers from the traceback's
+        lines = source.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+        numbered = "\n".join(f"{i:3d} | {line}" for i, line in enumerate(lines, 1))
+        return numbered, source
     
     def run_debug(self):
         """Debug a script: execute → analyze → propose corrections."""
@@ -72,9 +151,11 @@ class DebuggerAgent:
         print(f"DEBUGGING: {self.script_name}")
         print(f"{'='*70}\n{RESET}")
         
-        # Step 1: Execute script
+        # Step 1: Execute script (the source is read in the background meanwhile)
         print("Step 1: Executing script...\n")
-        execution = self._execute_script()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            source_future = pool.submit(self._get_numbered_source)
+            execution = self._execute_script()
         
         if execution["success"]:
             print("✅ Script executed successfully!\n")
@@ -89,7 +170,7 @@ class DebuggerAgent:
         
         # Step 2: Get numbered source
         print("Step 2: Reading source code...\n")
-        numbered_source = self._get_numbered_source()
+        numbered_source, self._source = source_future.result()
         
         # Step 3: Analyze with AI
         print("Step 3: Analyzing with Groq AI...\n")
@@ -99,24 +180,34 @@ class DebuggerAgent:
         self._display_analysis(analysis)
         self._apply_fixes_interactive(analysis)
     
-    def _analyze(self, source_code, traceback):
-        """Analyze bug using AI with system prompt."""
+    def _analyze(self, source_code, traceback, no_cache=False):
+        """Analyze bug using AI with system prompt (cached unless no_cache)."""
         user_message = f"{self.context}\n\nSOURCE CODE:\n{source_code}\n\nTRACEBACK:\n{traceback}"
         
-        response = self.client.messages.create(
-            model="mixtral-8x7b-32768",
+        cache_key = llm_cache.make_key(self.system_prompt, user_message, self.model)
+        if not no_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = create_completion(
+            self.client,
+            model=self.model,
             messages=[
+                {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": user_message}
             ],
-            system=self.system_prompt,
-            max_tokens=2000
+            temperature=0,
+            max_tokens=max_tokens_for(source_code),
+            **output_format(self.model)
         )
         
-        content = response.content[0].text
+        content = response.choices[0].message.content
         
         try:
-            analysis = json.loads(content)
-        except json.JSONDecodeError:
+            analysis = _json.loads(content)
+            llm_cache.put(cache_key, analysis)
+        except _json.JSONDecodeError:
             # Fallback if AI doesn't return valid JSON
             analysis = {
                 "delete": [],
@@ -181,25 +272,40 @@ class DebuggerAgent:
             print("Fixes not applied")
     
     def _apply_patches(self, analysis):
-        """Apply the suggested fixes to the script."""
-        with open(self.script_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+        """
+        Apply the suggested fixes to the script in a single pass.
         
-        deletes = analysis.get("delete", [])
-        for delete_item in sorted(deletes, key=lambda x: x.get("line", 0), reverse=True):
-            line_no = delete_item.get("line", 0)
-            if 1 <= line_no <= len(lines):
-                lines.pop(line_no - 1)
+        Line numbers refer to the numbered source sent to the AI: deleted
+        lines are skipped and additions are written after their line. The
+        script is replaced atomically, so an interrupted write cannot
+        truncate it.
+        """
+        if self._source is not None:
+            # Split on "\n" only, as in _get_numbered_source
+            lines = io.StringIO(self._source).readlines()
+        else:
+            with open(self.script_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
         
-        adds = analysis.get("add", [])
-        for add_item in sorted(adds, key=lambda x: x.get("line", 0)):
-            line_no = add_item.get("line", 0)
-            content = add_item.get("content", "") + "\n"
-            if 0 <= line_no <= len(lines):
-                lines.insert(line_no, content)
-        
-        with open(self.script_path, "w", encoding="utf-8") as f:
-            f.writelines(lines)
+        delete_set = {item.get("line", 0) for item in analysis.get("delete", [])}
+        adds_by_line = defaultdict(list)
+        for add_item in analysis.get("add", []):
+            adds_by_line[add_item.get("line", 0)].append(add_item.get("content", "") + "\n")
+        
+        patched = list(adds_by_line.get(0, []))
+        for line_no, line in enumerate(lines, 1):
+            if line_no not in delete_set:
+                patched.append(line)
+                if line_no in adds_by_line and not line.endswith("\n"):
+                    patched.append("\n")
+            patched.extend(adds_by_line.get(line_no, []))
+        
+        # Single write to a temporary file, then renamed over the script
+        tmp_path = self.script_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(patched))
+        shutil.copymode(self.script_path, tmp_path)
+        os.replace(tmp_path, self.script_path)
         
         print(f"{GREEN}✔ Script patched successfully!{RESET}")
 
@@ -1,27 +1,117 @@
 """
 Détecte l'environnement du projet (Python, venvs, dépendances).
 """
-import subprocess
+import atexit
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from pathlib import Path
 
+# Répertoires jamais parcourus lors de la recherche de fichiers Python
+# (en plus des répertoires cachés, dont le nom commence par ".")
+_EXCLUDED_DIRS = frozenset({
+    "venv", "env", "smart_debugger_env",
+    "__pycache__", "node_modules", "site-packages"
+})
+
+# Interpréteur d'un venv : chemin de la plateforme courante d'abord,
+# l'autre en secours (venv créé sous Windows et lu depuis WSL, par exemple)
+if os.name == "nt":
+    _VENV_PYTHON = (("Scripts", "python.exe"), ("bin", "python"))
+else:
+    _VENV_PYTHON = (("bin", "python"), ("Scripts", "python.exe"))
+
+# Sections renvoyées par detect_all, dans l'ordre
+SECTIONS = ("python_version", "virtual_env", "package_manager", "requirements", "python_files")
+
+# Pool partagé par tous les détecteurs : les threads sont créés à la
+# demande puis réutilisés d'un appel à l'autre
+_POOL = ThreadPoolExecutor(max_workers=len(SECTIONS), thread_name_prefix="env_detector")
+atexit.register(_POOL.shutdown, wait=False)
+
+# Pool distinct pour parcourir les sous-répertoires : python_files tourne
+# déjà dans _POOL, y soumettre d'autres tâches pourrait le bloquer
+_WALK_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="env_detector_walk")
+atexit.register(_WALK_POOL.shutdown, wait=False)
+
+
+def _scan_python_files(directory, prefix, subdirs):
+    """
+    Fichiers .py d'un répertoire (chemins préfixés par prefix) ; ajoute à
+    subdirs les sous-répertoires à parcourir.
+    """
+    files = []
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return files
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name[:1] != "." and entry.name not in _EXCLUDED_DIRS:
+                    subdirs.append((entry.path, prefix + entry.name + os.sep))
+            elif entry.name.endswith(".py"):
+                files.append(prefix + entry.name)
+    return files
+
+
+def _walk_python_files(directory, prefix):
+    """Fichiers .py d'une arborescence, parcourue sans récursion."""
+    files = []
+    pending = [(directory, prefix)]
+    while pending:
+        files.extend(_scan_python_files(*pending.pop(), pending))
+    return files
+
+
+def _venv_python(venv_path):
+    """Chemin de l'interpréteur d'un venv (celui de la plateforme s'il n'existe aucun des deux)."""
+    for parts in _VENV_PYTHON:
+        candidate = os.path.join(venv_path, *parts)
+        if os.path.lexists(candidate):
+            return candidate
+    return os.path.join(venv_path, *_VENV_PYTHON[0])
+
 
 class EnvironmentDetector:
     def __init__(self, project_path=None):
         """Initialise le détecteur."""
         self.project_path = Path(project_path) if project_path else Path.cwd()
     
-    def detect_all(self):
-        """Détecte tous les éléments de l'environnement."""
-        return {
-            "python_version": self._detect_python(),
-            "virtual_env": self._detect_venv(),
-            "package_manager": self._detect_package_manager(),
-            "requirements": self._detect_requirements(),
-            "python_files": self._find_python_files()
-        }
+    def detect_all(self, include=None):
+        """
+        Détecte les éléments de l'environnement demandés (tous par défaut).
+        
+        Les sections sont recalculées à chaque appel (un fichier ajouté dans
+        un sous-répertoire ne change aucun mtime de la racine), en parallèle :
+        surtout des appels système, qui libèrent le GIL.
+        
+        Args:
+            include: Noms de sections (voir SECTIONS) à calculer
+        """
+        self.invalidate()
+        sections = SECTIONS if include is None else [name for name in SECTIONS if name in include]
+        if len(sections) > 1:
+            list(_POOL.map(lambda name: getattr(self, name), sections))
+        return {name: getattr(self, name) for name in sections}
+    
+    def invalidate(self):
+        """Oublie les sections déjà calculées."""
+        for name in SECTIONS + ("_root_names",):
+            self.__dict__.pop(name, None)
+    
+    @cached_property
+    def _root_names(self):
+        """Noms des entrées à la racine du projet, lus en un seul parcours."""
+        try:
+            with os.scandir(self.project_path) as entries:
+                return frozenset(entry.name for entry in entries)
+        except OSError:
+            return frozenset()
     
-    def _detect_python(self):
+    @cached_property
+    def python_version(self):
         """Détecte la version Python."""
         return {
             "found": True,
@@ -29,17 +119,19 @@ class EnvironmentDetector:
             "executable": sys.executable
         }
     
-    def _detect_venv(self):
+    @cached_property
+    def virtual_env(self):
         """Détecte les environnements virtuels."""
         venvs = []
+        names = self._root_names
         for venv_name in ['venv', '.venv', 'env', 'smart_debugger_env']:
-            venv_path = self.project_path / venv_name
-            if venv_path.exists():
+            if venv_name in names:
+                venv_path = str(self.project_path / venv_name)
                 venvs.append({
                     "name": venv_name,
-                    "path": str(venv_path),
+                    "path": venv_path,
                     "type": "venv",
-                    "python_executable": str(venv_path / "bin" / "python")
+                    "python_executable": _venv_python(venv_path)
                 })
         
         return {
@@ -48,18 +140,20 @@ class EnvironmentDetector:
             "conda_envs": []
         }
     
-    def _detect_package_manager(self):
+    @cached_property
+    def package_manager(self):
         """Détecte les gestionnaires de paquets."""
         managers = []
         files = {}
         
-        if (self.project_path / "requirements.txt").exists():
+        names = self._root_names
+        if "requirements.txt" in names:
             managers.append("pip")
             files["requirements.txt"] = True
-        if (self.project_path / "Pipfile").exists():
+        if "Pipfile" in names:
             managers.append("pipenv")
             files["Pipfile"] = True
-        if (self.project_path / "pyproject.toml").exists():
+        if "pyproject.toml" in names:
             managers.append("poetry")
             files["pyproject.toml"] = True
         
@@ -69,23 +163,35 @@ class EnvironmentDetector:
             "files": files
         }
     
-    def _detect_requirements(self):
+    @cached_property
+    def requirements(self):
         """Détecte les dépendances."""
-        req_path = self.project_path / "requirements.txt"
-        if req_path.exists():
-            with open(req_path, 'r') as f:
-                packages = [line.strip() for line in f if line.strip()]
-            return {
-                "found": True,
-                "count": len(packages),
-                "packages": packages
-            }
-        return {"found": False, "count": 0, "packages": []}
+        try:
+            text = (self.project_path / "requirements.txt").read_text(encoding='utf-8')
+        except OSError:
+            return {"found": False, "count": 0, "packages": []}
+        
+        packages = [line for line in map(str.strip, text.splitlines()) if line and not line.startswith('#')]
+        return {
+            "found": True,
+            "count": len(packages),
+            "packages": packages
+        }
     
-    def _find_python_files(self):
-        """Trouve tous les fichiers Python."""
-        files = []
-        for py_file in self.project_path.rglob("*.py"):
-            if "venv" not in str(py_file) and "__pycache__" not in str(py_file):
-                files.append(str(py_file.relative_to(self.project_path)))
+    @cached_property
+    def python_files(self):
+        """
+        Trouve tous les fichiers Python, sans descendre dans les répertoires exclus ou cachés.
+        
+        Chaque sous-répertoire de la racine est parcouru dans son propre
+        thread : sur un système de fichiers réseau, les appels système
+        (qui libèrent le GIL) se recouvrent.
+        """
+        subdirs = []
+        files = _scan_python_files(str(self.project_path), "", subdirs)
+        if len(subdirs) > 1:
+            for walked in _WALK_POOL.map(lambda args: _walk_python_files(*args), subdirs):
+                files.extend(walked)
+        elif subdirs:
+            files.extend(_walk_python_files(*subdirs[0]))
         return sorted(files)
@@ -2,45 +2,647 @@
 Executes Python scripts and captures output and errors.
 Provides source code with line numbers for AI analysis.
 """
+import atexit
+import ctypes
+import functools
+import io
+import json
+import os
+import queue
+import re
+import runpy
+import shutil
 import subprocess
+import sys
+import threading
+import traceback
+import warnings
+from collections import deque
+from contextlib import redirect_stderr, redirect_stdout
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set
 
+# Extra interpreter flags for running scripts, e.g. "-S" to skip site
+# initialisation when scripts only need the standard library. Off by default:
+# -S hides installed packages and -I also hides the script's own directory.
+PYTHON_FLAGS = tuple(os.getenv("DEBUGGER_PYTHON_FLAGS", "").split())
 
-def execute_script(script_path: Path) -> Dict[str, Any]:
+# Lines of stdout/stderr kept from a script run (the last ones)
+OUTPUT_MAX_LINES = 2000
+# Bytes of stdout/stderr kept from a script run (the last ones)
+OUTPUT_MAX_BYTES = 1024 * 1024
+_TRUNCATED = b"...[truncated]...\n"
+
+# Seconds a script may run before it is killed
+SCRIPT_TIMEOUT = float(os.getenv("DEBUGGER_SCRIPT_TIMEOUT", "30"))
+
+# Lines always sent from the top of the file (imports, globals)
+HEAD_LINES = 30
+# Lines sent on each side of a line named in the traceback
+CONTEXT_LINES = 30
+# Files larger than this are not numbered (nor sent to the model)
+SOURCE_MAX_BYTES = 1024 * 1024
+_TRACEBACK_LINE_RE = re.compile(r'File "([^"]+)", line (\d+)')
+
+# Fork server run by PersistentRunner: reads one JSON request per line on
+# stdin, forks a child per script and answers with one JSON line on stdout.
+_DISPATCHER = r"""
+import atexit, collections, json, os, runpy, signal, sys, threading, traceback
+
+def run_child(job, out, err):
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out, 1)
+    os.dup2(err, 2)
+    os.close(out)
+    os.close(err)
+    os.chdir(job["cwd"])
+    script = os.path.abspath(job["script"])
+    sys.argv = [job["script"]]
+    sys.path[0] = os.path.dirname(script)
+    atexit._clear()
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide the runpy frames, as if the script had been run directly
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    # What interpreter shutdown would do before exiting
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread() and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+def read_tail(fd, job, result):
+    # Same bounds as executor._OutputTail
+    lines = collections.deque()
+    size = 0
+    truncated = False
+    with open(fd, "rb") as stream:
+        for line in iter(lambda: stream.readline(job["max_bytes"]), b""):
+            lines.append(line)
+            size += len(line)
+            while len(lines) > job["max_lines"] or size > job["max_bytes"]:
+                size -= len(lines.popleft())
+                truncated = True
+    data = b"".join(lines)
+    if truncated:
+        data = b"...[truncated]...\n" + data
+    result.append(data.decode("utf-8", "replace"))
+
+def kill(pid, killed):
+    killed.append(True)
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+for request in sys.stdin:
+    job = json.loads(request)
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_r)
+        os.close(err_r)
+        run_child(job, out_w, err_w)
+    os.close(out_w)
+    os.close(err_w)
+    stdout, stderr = [], []
+    readers = [
+        threading.Thread(target=read_tail, args=(out_r, job, stdout), daemon=True),
+        threading.Thread(target=read_tail, args=(err_r, job, stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+    killed = []
+    timer = threading.Timer(job["timeout"], kill, (pid, killed))
+    timer.start()
+    status = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+    timer.cancel()
+    for reader in readers:
+        # A child the script started may still hold the pipes open
+        reader.join(timeout=1)
+    response = {
+        "returncode": status,
+        "timed_out": bool(killed),
+        "stdout": stdout[0] if stdout else "",
+        "stderr": stderr[0] if stderr else "",
+    }
+    sys.stdout.write(json.dumps(response) + "\n")
+    sys.stdout.flush()
+"""
+
+
+class PersistentRunner:
+    """
+    Warm interpreter that forks a fresh child for each script (POSIX only).
+    
+    The fork skips interpreter startup and site initialisation on every run;
+    each child still starts from the same clean state.
+    """
+    
+    def __init__(self, python: str = "python"):
+        self.process = subprocess.Popen(
+            [python, *PYTHON_FLAGS, "-c", _DISPATCHER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self._lock = threading.Lock()
+    
+    def run(self, script_path: Path) -> Dict[str, Any]:
+        """
+        Run a script in a forked child.
+        
+        Raises:
+            RuntimeError: If the dispatcher process has died
+        """
+        request = json.dumps({
+            "script": str(script_path),
+            "cwd": str(script_path.parent),
+            "timeout": SCRIPT_TIMEOUT,
+            "max_lines": OUTPUT_MAX_LINES,
+            "max_bytes": OUTPUT_MAX_BYTES
+        })
+        with self._lock:
+            try:
+                self.process.stdin.write(request + "\n")
+                self.process.stdin.flush()
+                response = self.process.stdout.readline()
+            except (OSError, ValueError) as e:
+                raise RuntimeError("script runner is not available") from e
+        if not response:
+            raise RuntimeError("script runner exited")
+        result = json.loads(response)
+        if result["timed_out"]:
+            return _timeout_result(result["stdout"])
+        return {
+            "success": result["returncode"] == 0,
+            "stdout": result["stdout"],
+            "stderr": result["stderr"],
+            "traceback": result["stderr"]
+        }
+    
+    def close(self):
+        """Stop the dispatcher process."""
+        try:
+            # End of input stops the dispatcher's loop
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        self.process.stdout.close()
+
+
+# Warm runners used by execute_script(warm=True). Each one runs a script at a
+# time; up to RUNNER_POOL_SIZE are started on demand for concurrent callers.
+RUNNER_POOL_SIZE = max(1, int(os.getenv("DEBUGGER_RUNNER_POOL", "2")))
+_idle_runners: "queue.LifoQueue[PersistentRunner]" = queue.LifoQueue()
+_runners: List[PersistentRunner] = []
+_runners_lock = threading.Lock()
+
+
+def _checkout_runner() -> PersistentRunner:
+    """Take an idle runner, start one if the pool is not full, or wait for one."""
+    while True:
+        try:
+            runner = _idle_runners.get_nowait()
+        except queue.Empty:
+            with _runners_lock:
+                if len(_runners) < RUNNER_POOL_SIZE:
+                    runner = PersistentRunner()
+                    _runners.append(runner)
+                    return runner
+            try:
+                runner = _idle_runners.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        if runner.process.poll() is None:
+            return runner
+        _discard_runner(runner)
+
+
+def _discard_runner(runner: PersistentRunner) -> None:
+    """Drop a runner that died, freeing its place in the pool."""
+    runner.close()
+    with _runners_lock:
+        if runner in _runners:
+            _runners.remove(runner)
+
+
+def _close_runners() -> None:
+    """Stop every runner (at interpreter exit)."""
+    with _runners_lock:
+        for runner in _runners:
+            runner.close()
+        _runners.clear()
+
+
+atexit.register(_close_runners)
+
+
+def execute_script(script_path: Path, warm: bool = False) -> Dict[str, Any]:
     """
     Execute a Python script and capture output.
     
     Args:
         script_path: Path to the Python script
+        warm: Run through the shared PersistentRunner when the platform
+            supports fork (falls back to a fresh subprocess otherwise)
         
     Returns:
         Dict with success status, stdout, stderr, and traceback
     """
-    result = subprocess.run(
-        ["python", str(script_path)],
-        capture_output=True,
-        text=True,
-        cwd=script_path.parent
+    # Compiling here only stands for the run when "python" has this
+    # interpreter's version; otherwise the run reports syntax errors itself
+    syntax_error = _check_syntax(script_path) if _runs_host_version() else None
+    if syntax_error is not None:
+        return {
+            "success": False,
+            "stdout": "",
+            "stderr": syntax_error,
+            "traceback": syntax_error
+        }
+    
+    if warm and hasattr(os, "fork"):
+        try:
+            runner = _checkout_runner()
+        except OSError:
+            runner = None
+        if runner is not None:
+            try:
+                result = runner.run(script_path)
+            except RuntimeError:
+                _discard_runner(runner)
+            else:
+                _idle_runners.put(runner)
+                return result
+    
+    try:
+        process = subprocess.Popen(
+            ["python", *PYTHON_FLAGS, str(script_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=script_path.parent
+        )
+    except OSError as e:
+        # e.g. the script's directory does not exist
+        return {
+            "success": False,
+            "stdout": "",
+            "stderr": str(e),
+            "traceback": str(e)
+        }
+    
+    # Only the end of each stream is kept, so a chatty script cannot grow
+    # memory without bound (the traceback is last)
+    stdout_tail = _OutputTail()
+    stderr_tail = _OutputTail()
+    readers = [
+        threading.Thread(target=tail.read, args=(stream,), daemon=True)
+        for tail, stream in ((stdout_tail, process.stdout), (stderr_tail, process.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+    try:
+        process.wait(timeout=SCRIPT_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        timed_out = True
+    else:
+        timed_out = False
+    for reader in readers:
+        # A child the script started may still hold the pipes open
+        reader.join(timeout=1)
+    
+    if timed_out:
+        return _timeout_result(stdout_tail.text())
+    stderr = stderr_tail.text()
+    return {
+        "success": process.returncode == 0,
+        "stdout": stdout_tail.text(),
+        "stderr": stderr,
+        "traceback": stderr
+    }
+
+
+class _OutputTail:
+    """Last lines read from a pipe, within OUTPUT_MAX_LINES and OUTPUT_MAX_BYTES."""
+    
+    def __init__(self):
+        self.lines = deque()
+        self.size = 0
+        self.truncated = False
+    
+    def read(self, stream) -> None:
+        """Read a pipe to the end."""
+        with stream:
+            # readline is capped too: a script printing without newlines
+            # would otherwise build one huge line
+            for line in iter(lambda: stream.readline(OUTPUT_MAX_BYTES), b""):
+                self.lines.append(line)
+                self.size += len(line)
+                while len(self.lines) > OUTPUT_MAX_LINES or self.size > OUTPUT_MAX_BYTES:
+                    self.size -= len(self.lines.popleft())
+                    self.truncated = True
+    
+    def text(self) -> str:
+        data = b"".join(list(self.lines))
+        return _decode(_TRUNCATED + data if self.truncated else data)
+
+
+def _timeout_result(stdout: str) -> Dict[str, Any]:
+    message = f"TIMEOUT after {SCRIPT_TIMEOUT:g}s"
+    return {
+        "success": False,
+        "stdout": stdout,
+        "stderr": message,
+        "traceback": message
+    }
+
+
+# stdio, sys.argv and the working directory are process-wide
+_in_process_lock = threading.Lock()
+
+
+class _ScriptTimeout(BaseException):
+    """Raised inside an in-process script that ran past SCRIPT_TIMEOUT."""
+
+
+def execute_in_process(script_path: Path) -> Dict[str, Any]:
+    """
+    Run a script inside the current interpreter, capturing its output.
+    
+    No interpreter starts, so small scripts finish in microseconds, but the
+    script shares this process: modules it imports stay loaded (later edits
+    to them are not seen) and it can alter global state. Output redirection
+    is process-wide, so other threads printing during a run are captured
+    too. Runs are serialized; threads the script leaves running are not
+    waited for. atexit handlers registered by the script run when it ends.
+    
+    The script runs in a worker thread and is interrupted after
+    SCRIPT_TIMEOUT. The interruption is raised inside the script, so a
+    blocking call (time.sleep, a socket read) only stops once it returns;
+    until then, later in-process runs wait for it.
+    
+    Args:
+        script_path: Path to the Python script
+        
+    Returns:
+        Dict with success status, stdout, stderr, and traceback
+    """
+    if not _in_process_lock.acquire(timeout=SCRIPT_TIMEOUT):
+        message = "Another in-process run is still active"
+        return {
+            "success": False,
+            "stdout": "",
+            "stderr": message,
+            "traceback": message
+        }
+    
+    state = {"running": True, "success": True, "out": io.StringIO(), "err": io.StringIO()}
+    state_lock = threading.Lock()
+    # The worker releases _in_process_lock once the script has stopped
+    worker = threading.Thread(
+        target=_run_in_process,
+        args=(os.path.abspath(script_path), state, state_lock),
+        daemon=True
     )
+    worker.start()
+    worker.join(SCRIPT_TIMEOUT)
+    if worker.is_alive():
+        with state_lock:
+            if state["running"]:
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    ctypes.c_ulong(worker.ident), ctypes.py_object(_ScriptTimeout)
+                )
+        worker.join(1)
+        return _timeout_result(state["out"].getvalue())
+    
+    stderr = state["err"].getvalue()
     return {
-        "success": result.returncode == 0,
-        "stdout": result.stdout,
-        "stderr": result.stderr,
-        "traceback": result.stderr
+        "success": state["success"],
+        "stdout": state["out"].getvalue(),
+        "stderr": stderr,
+        "traceback": stderr
     }
 
 
-def get_numbered_source(script_path: Path) -> str:
+def _run_in_process(script: str, state: Dict[str, Any], state_lock: threading.Lock) -> None:
+    """Body of execute_in_process's worker thread."""
+    out, err = state["out"], state["err"]
+    saved_argv, saved_path, saved_cwd = sys.argv, sys.path[:], os.getcwd()
+    real_register = atexit.register
+    handlers = []
+    
+    def register(func, *args, **kwargs):
+        # Keep the script's own handlers; those of the modules it imports
+        # belong to the process
+        if sys._getframe(1).f_code.co_filename == script:
+            handlers.append((func, args, kwargs))
+            return func
+        return real_register(func, *args, **kwargs)
+    
+    try:
+        sys.argv = [script]
+        sys.path.insert(0, os.path.dirname(script))
+        atexit.register = register
+        try:
+            os.chdir(os.path.dirname(script))
+            with redirect_stdout(out), redirect_stderr(err):
+                try:
+                    runpy.run_path(script, run_name="__main__")
+                except SystemExit as e:
+                    if isinstance(e.code, int) or e.code is None:
+                        state["success"] = not e.code
+                    else:
+                        print(e.code, file=err)
+                        state["success"] = False
+                except Exception as e:
+                    # Hide the runpy frames, as if the script had been run directly
+                    tb = e.__traceback__
+                    while tb is not None and tb.tb_frame.f_code.co_filename != script:
+                        tb = tb.tb_next
+                    traceback.print_exception(type(e), e, tb, file=err)
+                    state["success"] = False
+                for func, args, kwargs in reversed(handlers):
+                    try:
+                        func(*args, **kwargs)
+                    except Exception:
+                        traceback.print_exc(file=err)
+        except OSError as e:
+            # e.g. the script's directory does not exist
+            print(e, file=err)
+            state["success"] = False
+        except _ScriptTimeout:
+            state["success"] = False
+    except _ScriptTimeout:
+        # Arrived while handling the script's own exception
+        state["success"] = False
+    finally:
+        # Idempotent, so redone if the timeout (raised at most once)
+        # interrupts it; no timeout is raised once "running" is False
+        while True:
+            try:
+                with state_lock:
+                    state["running"] = False
+                atexit.register = real_register
+                sys.argv = saved_argv
+                sys.path[:] = saved_path
+                os.chdir(saved_cwd)
+                break
+            except _ScriptTimeout:
+                continue
+        _in_process_lock.release()
+
+
+def _check_syntax(script_path: Path) -> Optional[str]:
+    """
+    Compile the script in-process, without running it.
+    
+    Returns:
+        The error report Python would print for a SyntaxError, or None if
+        the script compiles (or cannot be read: the run will report it)
+    """
+    try:
+        source = script_path.read_bytes()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            compile(source, str(script_path), "exec", dont_inherit=True)
+    except SyntaxError as e:
+        return "".join(traceback.format_exception_only(type(e), e))
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _runs_host_version() -> bool:
+    """Whether "python" on PATH, which runs the scripts, has this interpreter's version."""
+    python = shutil.which("python")
+    if python is None:
+        return False
+    python = os.path.realpath(python)
+    if python == os.path.realpath(sys.executable):
+        return True
+    try:
+        mtime_ns = os.stat(python).st_mtime_ns
+    except OSError:
+        return False
+    return _python_version(python, mtime_ns) == tuple(sys.version_info[:2])
+
+
+@functools.lru_cache(maxsize=8)
+def _python_version(python: str, mtime_ns: int) -> Optional[tuple]:
+    """(major, minor) of an interpreter, cached until the executable changes."""
+    try:
+        output = subprocess.run(
+            [python, "-c", "import sys; print(*sys.version_info[:2])"],
+            capture_output=True,
+            timeout=10
+        ).stdout
+        return tuple(int(part) for part in output.split())
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+
+
+def _decode(output: bytes) -> str:
+    """Decode captured output as UTF-8, tolerating invalid bytes."""
+    return output.decode('utf-8', errors='replace') if output else ""
+
+
+def get_numbered_source(script_path: Path, traceback: Optional[str] = None) -> str:
     """
     Read source code with line numbers.
     
+    The result is cached until the file's modification time or size
+    changes. Files over SOURCE_MAX_BYTES are replaced by a short marker,
+    unless a traceback points into them (the excerpt is sent instead).
+    
     Args:
         script_path: Path to the Python file
+        traceback: If given, keep only the top of the file and the lines
+            around those the traceback points to in this script (the whole
+            file if it points to none)
         
     Returns:
         Source code formatted with line numbers
     """
-    with open(script_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    return ''.join([f"{i+1:3d} | {line}" for i, line in enumerate(lines)])
+    stat = script_path.stat()
+    key = (str(script_path), stat.st_mtime_ns, stat.st_size)
+    too_large = stat.st_size > SOURCE_MAX_BYTES
+    if traceback:
+        error_lines = _error_lines(traceback, script_path)
+        if error_lines:
+            # Large files are read for the excerpt only, not kept in the cache
+            lines = _source_lines.__wrapped__(*key) if too_large else _source_lines(*key)
+            return _excerpt(lines, error_lines)
+    if too_large:
+        return f"[too large: {stat.st_size} bytes]\n"
+    return _numbered_source(*key)
+
+
+def _error_lines(traceback: str, script_path: Path) -> Set[int]:
+    """Line numbers of the script's own frames in a traceback."""
+    name = Path(script_path).name
+    return {
+        int(line)
+        for path, line in _TRACEBACK_LINE_RE.findall(traceback)
+        if Path(path).name == name
+    }
+
+
+def _excerpt(lines: List[str], error_lines: Set[int]) -> str:
+    """Number HEAD_LINES and CONTEXT_LINES around each error line; mark omitted ranges."""
+    keep = set(range(1, HEAD_LINES + 1))
+    for line in error_lines:
+        keep.update(range(line - CONTEXT_LINES, line + CONTEXT_LINES + 1))
+    
+    parts = []
+    omitted_from = None
+    for i, line in enumerate(lines, 1):
+        if i in keep:
+            if omitted_from is not None:
+                parts.append(f"    # ... L{omitted_from}-L{i - 1} omitted ...")
+                omitted_from = None
+            parts.append(f"{i:3d} | {line}")
+        elif omitted_from is None:
+            omitted_from = i
+    if omitted_from is not None:
+        parts.append(f"    # ... L{omitted_from}-L{len(lines)} omitted ...")
+    return '\n'.join(parts) + '\n'
+
+
+@functools.lru_cache(maxsize=64)
+def _source_lines(path: str, mtime_ns: int, size: int) -> List[str]:
+    """Lines of a file, read in one call."""
+    # split('\n') rather than splitlines(): Python does not end a line at
+    # form feeds and the other separators splitlines() recognizes
+    # errors='replace': a file that is not valid UTF-8 is still shown
+    lines = Path(path).read_text(encoding='utf-8', errors='replace').split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    return lines
+
+
+@functools.lru_cache(maxsize=64)
+def _numbered_source(path: str, mtime_ns: int, size: int) -> str:
+    """Number the lines of a file, joined once."""
+    lines = _source_lines(path, mtime_ns, size)
+    return ''.join([f"{i:3d} | {line}\n" for i, line in enumerate(lines, 1)])
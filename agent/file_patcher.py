@@ -1,8 +1,49 @@
 """
 Applique les corrections aux fichiers.
 """
+import os
 from pathlib import Path
-from shutil import copy
+from shutil import copyfile, copymode
+
+
+def _copy_contents(src, dst):
+    """
+    Copie le contenu d'un fichier, sans ses métadonnées.
+    
+    Sous Linux, copy_file_range laisse le noyau copier (voire partager les
+    blocs en reflink sur btrfs/XFS) ; sinon, shutil.copyfile.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            return
+        except OSError:
+            pass
+    copyfile(src, dst)
+
+
+def corrections_from_analysis(analysis):
+    """
+    Corrections à passer à FilePatcher.apply_corrections.
+    
+    Les ajouts sont listés après les suppressions : à numéro égal, le tri
+    stable de apply_corrections fait gagner l'ajout.
+    """
+    corrections = [
+        {"line_number": item["line_number"], "new_code": ""}
+        for item in analysis.get("lines_to_delete", [])
+    ]
+    corrections.extend(
+        {"line_number": item["line_number"], "new_code": item["content"]}
+        for item in analysis.get("lines_to_add", [])
+    )
+    return corrections
 
 
 class FilePatcher:
@@ -10,30 +51,89 @@ class FilePatcher:
         """Initialise le patcher."""
         pass
     
+    def _create_backup(self, script):
+        """
+        Crée la sauvegarde .py.bak du script.
+        
+        Un lien physique suffit (aucune copie) car le script est ensuite
+        remplacé par renommage : la sauvegarde garde l'ancien contenu.
+        """
+        backup_path = script.with_suffix('.py.bak')
+        try:
+            backup_path.unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(script, backup_path)
+        except OSError:
+            # Autre système de fichiers, ou liens physiques non supportés
+            _copy_contents(script, backup_path)
+        return backup_path
+    
     def apply_corrections(self, script_path, corrections):
-        """Applique les corrections au fichier."""
+        """
+        Applique les corrections au fichier (écriture atomique).
+        
+        Les corrections sont triées par numéro de ligne (tri stable : à
+        numéro égal, la dernière l'emporte), quel que soit leur ordre.
+        
+        Si les corrections ne changent aucun octet, le fichier n'est ni
+        sauvegardé ni réécrit ("changed" vaut False, "backup_path" None).
+        """
         script = Path(script_path)
+        if not corrections:
+            return {"success": True, "applied_count": 0, "changed": False, "backup_path": None}
         
-        # Créer une sauvegarde
-        backup_path = script.with_suffix('.py.bak')
-        copy(script, backup_path)
+        # Lire le fichier tel quel : les lignes non corrigées sont recopiées
+        # octet pour octet, sans créer un objet str par ligne
+        data = script.read_bytes()
+        
+        # Chaque correction remplace une ligne (à numéro égal, la dernière l'emporte)
+        by_line = {
+            correction['line_number']: correction['new_code']
+            for correction in sorted(corrections, key=lambda correction: correction['line_number'])
+        }
+        line_nums = list(by_line)
+        
+        # Fin (après le \n) de chaque ligne, jusqu'à la dernière ligne corrigée
+        last = line_nums[-1]
+        ends = []
+        pos = 0
+        while len(ends) < last and pos < len(data):
+            newline = data.find(b'\n', pos)
+            pos = len(data) if newline < 0 else newline + 1
+            ends.append(pos)
+        
+        # Assembler le résultat en une passe : morceaux inchangés et lignes
+        # corrigées, dans l'ordre, joints une seule fois
+        parts = []
+        pos = 0
+        for line_num in (n for n in line_nums if 1 <= n <= len(ends)):
+            start = ends[line_num - 2] if line_num > 1 else 0
+            parts.append(data[pos:start])
+            parts.append(by_line[line_num].encode('utf-8') + b'\n')
+            pos = ends[line_num - 1]
+        parts.append(data[pos:])
+        buffer = b''.join(parts)
         
-        # Lire le fichier
-        with open(script, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        if buffer == data:
+            return {"success": True, "applied_count": len(corrections), "changed": False, "backup_path": None}
         
-        # Appliquer les corrections (en ordre inverse pour éviter les décalages)
-        for correction in sorted(corrections, key=lambda x: x['line_number'], reverse=True):
-            line_num = correction['line_number'] - 1
-            if 0 <= line_num < len(lines):
-                lines[line_num] = correction['new_code'] + '\n'
+        # Créer une sauvegarde (avant le remplacement du script)
+        backup_path = self._create_backup(script)
         
-        # Écrire le fichier
-        with open(script, 'w', encoding='utf-8') as f:
-            f.writelines(lines)
+        # Écrire dans un fichier temporaire puis le renommer sur le script
+        tmp_path = script.with_suffix(script.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        copymode(script, tmp_path)
+        os.replace(tmp_path, script)
         
         return {
             "success": True,
             "applied_count": len(corrections),
+            "changed": True,
             "backup_path": str(backup_path)
         }
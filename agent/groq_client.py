@@ -0,0 +1,193 @@
+"""
+Shared helpers for calling the Groq chat completions API.
+Requests are throttled to the account's rate limits, bounded by a timeout
+and retried with jittered exponential backoff on transient errors.
+"""
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+REQUEST_TIMEOUT = float(os.getenv("GROQ_REQUEST_TIMEOUT", "15"))
+MAX_RETRIES = 4
+# Bounds of the randomized backoff between retries, in seconds
+BACKOFF_MIN = 1.0
+BACKOFF_MAX = 30.0
+# Requests in flight at once for the async API
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+MAX_TOKENS = 800
+# Account rate limits (requests and tokens per minute); 0 disables a limit
+RPM_LIMIT = int(os.getenv("GROQ_RPM", "30"))
+TPM_LIMIT = int(os.getenv("GROQ_TPM", "6000"))
+# Stop right after a closing ``` fence: nothing useful follows the JSON
+STOP_SEQUENCES = ["\n```\n"]
+# Models that support JSON mode (response_format json_object)
+JSON_MODE_MODELS = frozenset({"llama-3.3-70b-versatile", "mixtral-8x7b-32768"})
+
+
+class _RateLimiter:
+    """
+    Sliding one-minute window over requests and their estimated tokens.
+    
+    Callers wait until a request fits in both limits instead of being
+    rejected with a 429 and retrying blindly.
+    """
+    
+    WINDOW = 60.0
+    
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._events = deque()  # (monotonic time, estimated tokens)
+        self._tokens = 0
+        self._lock = threading.Lock()
+    
+    def _reserve(self, tokens: int) -> float:
+        """Record the request and return 0 if it fits now, else the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            while self._events and self._events[0][0] <= now - self.WINDOW:
+                self._tokens -= self._events.popleft()[1]
+            if self.tpm:
+                # A request larger than the whole budget waits for an empty window
+                tokens = min(tokens, self.tpm)
+            
+            wait_until = now
+            if self.rpm and len(self._events) >= self.rpm:
+                wait_until = self._events[len(self._events) - self.rpm][0] + self.WINDOW
+            excess = self._tokens + tokens - self.tpm if self.tpm else 0
+            if excess > 0:
+                for timestamp, count in self._events:
+                    excess -= count
+                    if excess <= 0:
+                        wait_until = max(wait_until, timestamp + self.WINDOW)
+                        break
+            
+            if wait_until <= now:
+                self._events.append((now, tokens))
+                self._tokens += tokens
+                return 0.0
+            return wait_until - now
+    
+    def acquire(self, tokens: int) -> None:
+        """Block until a request of about `tokens` tokens may be sent."""
+        while (delay := self._reserve(tokens)) > 0:
+            time.sleep(delay)
+    
+    async def aacquire(self, tokens: int) -> None:
+        """Async version of acquire."""
+        while (delay := self._reserve(tokens)) > 0:
+            await asyncio.sleep(delay)
+
+
+# Shared by every client: the limits apply to the account, not to a client
+_limiter = _RateLimiter(RPM_LIMIT, TPM_LIMIT)
+
+
+def _estimate_tokens(kwargs) -> int:
+    """Rough token count of a request: prompt characters / 4, plus the output budget."""
+    prompt_chars = sum(len(message.get("content") or "") for message in kwargs.get("messages", []))
+    return prompt_chars // 4 + kwargs.get("max_tokens", MAX_TOKENS)
+
+
+@functools.lru_cache(maxsize=8)
+def get_client(api_key: str = None):
+    """
+    Return a Groq client shared by every caller using the same key.
+    
+    Reusing the client keeps its HTTP connection pool (and TLS sessions)
+    alive across analyzers and debug runs.
+    """
+    # Imported lazily: the Groq SDK pulls in httpx/pydantic at import time
+    from groq import Groq
+    return Groq(api_key=api_key, max_retries=0)
+
+
+def output_format(model: str) -> dict:
+    """
+    Arguments constraining a non-streamed completion to a JSON object.
+    
+    JSON mode where the model supports it (the reply is then parseable as
+    is); otherwise stop after the closing code fence, and the caller
+    extracts the object from the text.
+    """
+    if model in JSON_MODE_MODELS:
+        return {"response_format": {"type": "json_object"}}
+    return {"stop": STOP_SEQUENCES}
+
+
+def max_tokens_for(source_code: str) -> int:
+    """Output token budget scaled to the size of the script (capped at MAX_TOKENS)."""
+    return min(MAX_TOKENS, 300 + 10 * (source_code.count("\n") + 1))
+
+
+def _retry_delay(error, attempt: int) -> float:
+    """
+    Seconds to wait before retrying after `error`.
+    
+    Honors the server's Retry-After header (in seconds) when present;
+    otherwise exponential backoff with full jitter, so that concurrent
+    callers hitting the same 429 do not retry in lockstep.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(BACKOFF_MIN, min(BACKOFF_MAX, BACKOFF_MIN * 2 ** (attempt + 1)))
+
+
+def _retryable_errors():
+    """Transient Groq errors: timeouts, connection failures, 429s and 5xx."""
+    from groq import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+
+def create_completion(client, **kwargs):
+    """
+    Call client.chat.completions.create, retrying transient failures.
+    
+    Args:
+        client: Groq client (built with max_retries=0, retries happen here)
+        **kwargs: Arguments forwarded to chat.completions.create
+    
+    Returns:
+        The completion, or the chunk stream when stream=True
+    """
+    retryable = _retryable_errors()
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    for attempt in range(MAX_RETRIES + 1):
+        _limiter.acquire(_estimate_tokens(kwargs))
+        try:
+            return client.chat.completions.create(**kwargs)
+        except retryable as e:
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(e, attempt))
+
+
+async def acreate_completion(client, **kwargs):
+    """
+    Async version of create_completion, for an AsyncGroq client.
+    
+    Args:
+        client: AsyncGroq client (built with max_retries=0, retries happen here)
+        **kwargs: Arguments forwarded to chat.completions.create
+    
+    Returns:
+        The completion
+    """
+    retryable = _retryable_errors()
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    for attempt in range(MAX_RETRIES + 1):
+        await _limiter.aacquire(_estimate_tokens(kwargs))
+        try:
+            return await client.chat.completions.create(**kwargs)
+        except retryable as e:
+            if attempt == MAX_RETRIES:
+                raise
+            await asyncio.sleep(_retry_delay(e, attempt))
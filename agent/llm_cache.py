@@ -0,0 +1,81 @@
+"""
+On-disk cache of LLM responses.
+Entries are keyed by a hash of everything that determines the answer
+(prompts, source code, traceback, model) and expire after TTL_SECONDS.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CACHE_DIR = Path.home() / ".cache" / "debugger_agent"
+# Entries older than this (by file mtime) count as misses
+TTL_SECONDS = 7 * 24 * 3600
+
+
+def make_key(*parts: str) -> str:
+    """Build a cache key from the request inputs."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached response.
+    
+    Args:
+        key: Key returned by make_key
+    
+    Returns:
+        The cached dict, or None on a miss or an expired entry
+    """
+    try:
+        with open(CACHE_DIR / f"{key}.json", 'rb') as f:
+            if time.time() - os.fstat(f.fileno()).st_mtime > TTL_SECONDS:
+                return None
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        return orjson.loads(data) if orjson else json.loads(data)
+    except ValueError:
+        return None
+
+
+def put(key: str, value: Dict[str, Any]) -> None:
+    """
+    Store a response; failures to write are ignored.
+    
+    The entry is written compactly to a temporary file and renamed into
+    place, so a crash never leaves a truncated entry behind.
+    """
+    if orjson:
+        data = orjson.dumps(value)
+    else:
+        data = json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    tmp = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # A unique name per writer: threads of one process may store the
+        # same key concurrently
+        fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=CACHE_DIR)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, CACHE_DIR / f"{key}.json")
+    except OSError:
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
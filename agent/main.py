@@ -5,15 +5,16 @@ Executes scripts, analyzes errors with Groq AI, and applies fixes.
 Usage:
     python main.py examples/example_1.py
 """
+import asyncio
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 from executor import execute_script, get_numbered_source
 from ai_analyzer import AIAnalyzer
-from file_patcher import FilePatcher
+from file_patcher import FilePatcher, corrections_from_analysis
 from config import BOLD, BLUE, RED, GREEN, YELLOW, RESET
 
 load_dotenv()
@@ -21,10 +22,6 @@ load_dotenv()
 
 def debug_script(script_path: Path) -> Optional[dict]:
     """Debug a Python script and optionally apply AI-suggested fixes."""
-    if not script_path.exists():
-        print(f"{RED}Error: {script_path} not found{RESET}")
-        return None
-    
     # Step 1: Execute script
     print(f"\n{BOLD}{BLUE}{'='*70}{RESET}")
     print(f"DEBUGGING: {script_path.name}")
@@ -40,6 +37,11 @@ def debug_script(script_path: Path) -> Optional[dict]:
             print(execution["stdout"])
         return execution
     
+    # Only a failed run needs to check whether the script exists at all
+    if not script_path.exists():
+        print(f"{RED}Error: {script_path} not found{RESET}")
+        return None
+    
     print(f"{RED}✗ Error detected:{RESET}\n")
     print(execution["stderr"])
     print()
@@ -54,7 +56,7 @@ def debug_script(script_path: Path) -> Optional[dict]:
     
     try:
         analyzer = AIAnalyzer(groq_key)
-        numbered_source = get_numbered_source(script_path)
+        numbered_source = get_numbered_source(script_path, execution["traceback"])
         analysis = analyzer.analyze(numbered_source, execution["traceback"])
         
         # Display results
@@ -80,22 +82,12 @@ def debug_script(script_path: Path) -> Optional[dict]:
             response = input(f"{BOLD}Apply fixes? (y/n): {RESET}").strip().lower()
             if response in ['y', 'yes', '']:
                 patcher = FilePatcher()
-                corrections = []
-                
-                for delete in analysis.get("lines_to_delete", []):
-                    corrections.append({
-                        "line_number": delete["line_number"],
-                        "new_code": ""
-                    })
-                
-                for add in analysis.get("lines_to_add", []):
-                    corrections.append({
-                        "line_number": add["line_number"],
-                        "new_code": add["content"]
-                    })
+                corrections = corrections_from_analysis(analysis)
                 
                 fix_result = patcher.apply_corrections(script_path, corrections)
-                if fix_result["success"]:
+                if fix_result["success"] and not fix_result["changed"]:
+                    print(f"{YELLOW}⚠ The corrections leave the script unchanged{RESET}")
+                elif fix_result["success"]:
                     print(f"{GREEN}✓ Applied {fix_result['applied_count']} correction(s){RESET}")
                     print(f"  Backup: {fix_result['backup_path']}")
                 else:
@@ -109,14 +101,89 @@ def debug_script(script_path: Path) -> Optional[dict]:
         return None
 
 
+async def adebug_many(script_paths: List[Path]) -> List[dict]:
+    """
+    Run several scripts and analyze the failing ones concurrently.
+    
+    Returns:
+        One dict per script with its execution, its analysis (None on
+        success) and the error that prevented the analysis, if any
+    """
+    executions = await asyncio.gather(
+        *(asyncio.to_thread(execute_script, path, warm=True) for path in script_paths),
+        return_exceptions=True
+    )
+    groq_key = os.getenv("GROQ_API_KEY")
+    
+    # One analysis per distinct (source, traceback): identical failures share it
+    analyzer = None
+    pending = {}
+    reports = []
+    keys = []
+    for path, execution in zip(script_paths, executions):
+        report = {"script": str(path), "execution": None, "analysis": None, "error": None}
+        reports.append(report)
+        keys.append(None)
+        if isinstance(execution, Exception):
+            report["error"] = str(execution)
+            continue
+        report["execution"] = execution
+        if execution["success"]:
+            continue
+        if not path.exists():
+            report["error"] = f"{path} not found"
+            continue
+        if not groq_key:
+            report["error"] = "GROQ_API_KEY not set"
+            continue
+        try:
+            key = (get_numbered_source(path, execution["traceback"]), execution["traceback"])
+        except OSError as e:
+            report["error"] = str(e)
+            continue
+        if key not in pending:
+            analyzer = analyzer or AIAnalyzer(groq_key)
+            pending[key] = analyzer.aanalyze(*key)
+        keys[-1] = key
+    
+    # A failed analysis is reported on its scripts without cancelling the others
+    analyses = dict(zip(pending, await asyncio.gather(*pending.values(), return_exceptions=True)))
+    for report, key in zip(reports, keys):
+        analysis = analyses.get(key)
+        if isinstance(analysis, Exception):
+            report["error"] = str(analysis)
+        else:
+            report["analysis"] = analysis
+    return reports
+
+
 def main():
     if len(sys.argv) < 2:
-        print(f"{BOLD}{BLUE}Usage: python main.py <script_path>{RESET}")
+        print(f"{BOLD}{BLUE}Usage: python main.py <script_path> [<script_path> ...]{RESET}")
         print(f"Example: python main.py examples/example_1.py")
         return
     
-    script_path = Path(sys.argv[1])
-    debug_script(script_path)
+    if len(sys.argv) == 2:
+        debug_script(Path(sys.argv[1]))
+        return
+    
+    # Several scripts: analyze concurrently, report without applying fixes
+    for report in asyncio.run(adebug_many([Path(arg) for arg in sys.argv[1:]])):
+        print(f"{BOLD}{BLUE}{report['script']}{RESET}")
+        if report["error"] is not None:
+            print(f"  {RED}Error: {report['error']}{RESET}\n")
+            continue
+        analysis = report["analysis"]
+        if analysis is None:
+            print(f"  {GREEN}✓ Success - no errors!{RESET}\n")
+            continue
+        print(f"  {RED}✗ {analysis['error_type']}{RESET}")
+        print(f"  {analysis['analysis']}")
+        for item in analysis.get("lines_to_delete", []):
+            print(f"  {RED}Line {item['line_number']} (remove):{RESET} {item['content']}")
+        for item in analysis.get("lines_to_add", []):
+            print(f"  {GREEN}Line {item['line_number']} (add):{RESET} {item['content']}")
+        print()
 
 
 if __name__ == "__main__":
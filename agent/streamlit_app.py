@@ -4,11 +4,12 @@ Détermine automatiquement l'environnement et débugge vos scripts Python.
 """
 import streamlit as st
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from executor import execute_script, get_numbered_source
+from executor import execute_in_process, execute_script, get_numbered_source
 from ai_analyzer import AIAnalyzer
-from file_patcher import FilePatcher
+from file_patcher import FilePatcher, corrections_from_analysis
 from env_detector import EnvironmentDetector
 
 load_dotenv()
@@ -56,6 +57,39 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def _detect(project_path: str):
+    """
+    Detect the project environment.
+    
+    Not cached: the user clicks Detect to see the project as it is now
+    (a venv or requirements file created meanwhile).
+    """
+    return EnvironmentDetector(Path(project_path)).detect_all()
+
+
+@st.cache_resource
+def _get_analyzer(api_key: str):
+    """One AIAnalyzer per API key, shared across reruns and sessions."""
+    return AIAnalyzer(api_key)
+
+
+def _run_script(script_path: Path):
+    """
+    Execute a script, in-process if enabled in Settings.
+    
+    Runs are not cached: the outcome also depends on the modules the
+    script imports, installed packages and environment variables, which
+    the script's own mtime does not cover.
+    """
+    if st.session_state.get("in_process", False):
+        return execute_in_process(script_path)
+    return execute_script(script_path, warm=True)
+
+
+# Fragments (Streamlit >= 1.33): a widget inside only reruns its fragment
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
 # Initialize session state
 if 'env_detected' not in st.session_state:
     st.session_state.env_detected = False
@@ -63,6 +97,8 @@ if 'env_info' not in st.session_state:
     st.session_state.env_info = None
 if 'debug_result' not in st.session_state:
     st.session_state.debug_result = None
+if 'initial_cwd' not in st.session_state:
+    st.session_state.initial_cwd = str(Path.cwd())
 
 # Header
 st.markdown('<div class="main-header">Automatic Debug Agent</div>', unsafe_allow_html=True)
@@ -74,15 +110,14 @@ with st.sidebar:
     
     project_path = st.text_input(
         "Project Path",
-        value=str(Path.cwd()),
+        value=st.session_state.initial_cwd,
         help="Path to your Python project"
     )
     
     if st.button("Detect Environment", type="primary", use_container_width=True):
         with st.spinner("Detecting environment..."):
             try:
-                detector = EnvironmentDetector(Path(project_path))
-                env_info = detector.detect_all()
+                env_info = _detect(project_path)
                 st.session_state.env_info = env_info
                 st.session_state.env_detected = True
                 st.success("Environment detected!")
@@ -117,6 +152,214 @@ with st.sidebar:
         file_count = len(env["python_files"])
         st.caption(f"{file_count} files available")
 
+
+@_fragment
+def _debug_tab(python_files, project_path):
+    """Debug tab; its widgets only rerun this fragment."""
+    st.subheader("Debug Your Script")
+    
+    if not python_files:
+        st.warning("No Python files found in the project")
+    else:
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            selected_file = st.selectbox(
+                "Select a Python file",
+                options=python_files,
+                help="Choose a script to debug"
+            )
+        
+        with col2:
+            st.write("")
+            st.write("")
+            debug_button = st.button("Debug", type="primary", use_container_width=True)
+        
+        if debug_button and selected_file:
+            script_path = Path(project_path) / selected_file
+            
+            groq_api_key = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY") or st.session_state.get("groq_api_key")
+            
+            if not groq_api_key:
+                st.error("GROQ_API_KEY not found. Add it in .env or Settings.")
+            else:
+                with st.spinner(f"Debugging {selected_file}..."):
+                    try:
+                        # Execute script; its source is read and numbered meanwhile
+                        # (the result lands in get_numbered_source's cache)
+                        with ThreadPoolExecutor(max_workers=1) as pool:
+                            source_future = pool.submit(get_numbered_source, script_path)
+                            execution = _run_script(script_path)
+                        source_future.result()
+                        
+                        if execution["success"]:
+                            st.markdown('<div class="success-box"><b>Success!</b> Script ran without errors</div>', unsafe_allow_html=True)
+                            if execution["stdout"]:
+                                st.code(execution["stdout"], language="text")
+                        else:
+                            st.markdown('<div class="error-box"><b>Error detected</b></div>', unsafe_allow_html=True)
+                            
+                            with st.expander("Error Details", expanded=True):
+                                st.code(execution["stderr"], language="text")
+                            
+                            # Analyze with AI, showing the answer as it streams in
+                            analyzer = _get_analyzer(groq_api_key)
+                            numbered_code = get_numbered_source(script_path, execution["traceback"])
+                            live_output = st.empty()
+                            analysis = analyzer.analyze(
+                                numbered_code,
+                                execution["traceback"],
+                                on_chunk=lambda text: live_output.code(text, language="json")
+                            )
+                            live_output.empty()
+                            
+                            # Display analysis
+                            st.markdown("**AI Analysis**")
+                            col1, col2 = st.columns(2)
+                            with col1:
+                                st.caption(f"Error Type: `{analysis['error_type']}`")
+                            with col2:
+                                st.caption(f"Code Issue: {'Yes' if analysis['is_code_bug'] else 'No'}")
+                            
+                            st.info(analysis["analysis"])
+                            
+                            if analysis["is_code_bug"]:
+                                # One Markdown render for the whole list
+                                parts = ["**Proposed Corrections**\n"]
+                                for key, title in (("lines_to_delete", "Lines to Remove"), ("lines_to_add", "Lines to Add")):
+                                    if analysis.get(key):
+                                        parts.append(f"*{title}:*\n")
+                                        parts.extend(f"- Line **{item['line_number']}**: `{item['content']}`" for item in analysis[key])
+                                        parts.append("")
+                                st.markdown("\n".join(parts))
+                                
+                                st.divider()
+                                
+                                if st.button("Apply Fixes", type="primary", use_container_width=True):
+                                    with st.spinner("Applying corrections..."):
+                                        try:
+                                            patcher = FilePatcher()
+                                            corrections = corrections_from_analysis(analysis)
+                                            
+                                            fix_result = patcher.apply_corrections(script_path, corrections)
+                                            
+                                            if fix_result["success"] and not fix_result["changed"]:
+                                                st.info("The corrections leave the script unchanged")
+                                            elif fix_result["success"]:
+                                                st.success(f"Applied {fix_result['applied_count']} correction(s)")
+                                                st.caption(f"Backup: {fix_result['backup_path']}")
+                                                
+                                                # Re-execute to verify (only needed when the file changed)
+                                                st.info("Re-running script to verify...")
+                                                verification = _run_script(script_path)
+                                                
+                                                if verification["success"]:
+                                                    st.success("Script now works!")
+                                                    if verification["stdout"]:
+                                                        st.code(verification["stdout"], language="text")
+                                                else:
+                                                    st.warning("Script still has errors")
+                                                    st.code(verification["stderr"], language="text")
+                                            else:
+                                                st.error("Failed to apply corrections")
+                                        except Exception as e:
+                                            st.error(f"Error: {e}")
+                            else:
+                                st.warning("Issue is external to code")
+                                st.info(analysis["not_related_to_code"])
+                    
+                    except Exception as e:
+                        st.error(f"Debugging error: {e}")
+        
+        st.divider()
+        
+        # Several scripts: one AI request for all the failing ones
+        selected_files = st.multiselect(
+            "Debug several files",
+            options=python_files,
+            help="Failing scripts are analyzed together in a single AI request"
+        )
+        
+        if st.button("Debug selected files", use_container_width=True) and selected_files:
+            groq_api_key = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY") or st.session_state.get("groq_api_key")
+            
+            if not groq_api_key:
+                st.error("GROQ_API_KEY not found. Add it in .env or Settings.")
+            else:
+                with st.spinner(f"Debugging {len(selected_files)} files..."):
+                    try:
+                        executions = {
+                            name: _run_script(Path(project_path) / name)
+                            for name in selected_files
+                        }
+                        failed = [name for name in selected_files if not executions[name]["success"]]
+                        
+                        analyses = {}
+                        if failed:
+                            analyzer = _get_analyzer(groq_api_key)
+                            results = analyzer.analyze_many([
+                                (get_numbered_source(Path(project_path) / name, executions[name]["traceback"]), executions[name]["traceback"])
+                                for name in failed
+                            ])
+                            analyses = dict(zip(failed, results))
+                        
+                        for name in selected_files:
+                            execution = executions[name]
+                            if execution["success"]:
+                                st.markdown(f'<div class="success-box"><b>{name}</b> ran without errors</div>', unsafe_allow_html=True)
+                                continue
+                            
+                            analysis = analyses[name]
+                            st.markdown(f'<div class="error-box"><b>{name}</b>: {analysis["error_type"]}</div>', unsafe_allow_html=True)
+                            with st.expander("Details"):
+                                st.code(execution["stderr"], language="text")
+                                st.info(analysis["analysis"])
+                                corrections = [
+                                    *(f"- Remove line **{item['line_number']}**: `{item['content']}`" for item in analysis.get("lines_to_delete", [])),
+                                    *(f"- Add at line **{item['line_number']}**: `{item['content']}`" for item in analysis.get("lines_to_add", []))
+                                ]
+                                if corrections:
+                                    st.markdown("\n".join(corrections))
+                                if not analysis["is_code_bug"] and analysis["not_related_to_code"]:
+                                    st.warning(analysis["not_related_to_code"])
+                    
+                    except Exception as e:
+                        st.error(f"Debugging error: {e}")
+
+
+@_fragment
+def _settings_tab():
+    """Settings tab; its widgets only rerun this fragment."""
+    st.subheader("Settings")
+    
+    st.markdown("**API Configuration**")
+    
+    env_key = os.getenv("GROQ_API_KEY")
+    if env_key:
+        st.success("GROQ_API_KEY is loaded from .env")
+    else:
+        groq_key = st.text_input(
+            "Enter Groq API Key",
+            type="password",
+            help="Your Groq API key"
+        )
+        if st.button("Save API Key") and groq_key:
+            st.session_state.groq_api_key = groq_key
+            st.info("API key will be used for this session")
+    
+    st.divider()
+    
+    st.markdown("**Execution**")
+    st.checkbox(
+        "Run scripts in-process",
+        key="in_process",
+        help="Faster (no interpreter start), but scripts share the app's interpreter: "
+             "imported modules stay loaded, global state can change and the app's own "
+             "output is captured during a run. Scripts are stopped after the timeout, "
+             "but a blocking call (sleep, I/O) only stops once it returns"
+    )
+
+
 # Main content
 if not st.session_state.env_detected:
     st.info("Start by detecting your project environment in the sidebar")
@@ -141,126 +384,7 @@ else:
     tab1, tab2, tab3 = st.tabs(["Debug Script", "Environment", "Settings"])
     
     with tab1:
-        st.subheader("Debug Your Script")
-        
-        env = st.session_state.env_info
-        python_files = env.get("python_files", [])
-        
-        if not python_files:
-            st.warning("No Python files found in the project")
-        else:
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                selected_file = st.selectbox(
-                    "Select a Python file",
-                    options=python_files,
-                    help="Choose a script to debug"
-                )
-            
-            with col2:
-                st.write("")
-                st.write("")
-                debug_button = st.button("Debug", type="primary", use_container_width=True)
-            
-            if debug_button and selected_file:
-                script_path = Path(project_path) / selected_file
-                
-                groq_api_key = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY")
-                
-                if not groq_api_key:
-                    st.error("GROQ_API_KEY not found. Add it in .env or Settings.")
-                else:
-                    with st.spinner(f"Debugging {selected_file}..."):
-                        try:
-                            # Execute script
-                            execution = execute_script(script_path)
-                            
-                            if execution["success"]:
-                                st.markdown('<div class="success-box"><b>Success!</b> Script ran without errors</div>', unsafe_allow_html=True)
-                                if execution["stdout"]:
-                                    st.code(execution["stdout"], language="text")
-                            else:
-                                st.markdown('<div class="error-box"><b>Error detected</b></div>', unsafe_allow_html=True)
-                                
-                                with st.expander("Error Details", expanded=True):
-                                    st.code(execution["stderr"], language="text")
-                                
-                                # Analyze with AI
-                                analyzer = AIAnalyzer(groq_api_key)
-                                numbered_code = get_numbered_source(script_path)
-                                analysis = analyzer.analyze(numbered_code, execution["traceback"])
-                                
-                                # Display analysis
-                                st.markdown("**AI Analysis**")
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.caption(f"Error Type: `{analysis['error_type']}`")
-                                with col2:
-                                    st.caption(f"Code Issue: {'Yes' if analysis['is_code_bug'] else 'No'}")
-                                
-                                st.info(analysis["analysis"])
-                                
-                                if analysis["is_code_bug"]:
-                                    st.markdown("**Proposed Corrections**")
-                                    
-                                    if analysis.get("lines_to_delete"):
-                                        st.markdown("*Lines to Remove:*")
-                                        for item in analysis["lines_to_delete"]:
-                                            st.markdown(f"- Line **{item['line_number']}**: `{item['content']}`")
-                                    
-                                    if analysis.get("lines_to_add"):
-                                        st.markdown("*Lines to Add:*")
-                                        for item in analysis["lines_to_add"]:
-                                            st.markdown(f"- Line **{item['line_number']}**: `{item['content']}`")
-                                    
-                                    st.divider()
-                                    
-                                    if st.button("Apply Fixes", type="primary", use_container_width=True):
-                                        with st.spinner("Applying corrections..."):
-                                            try:
-                                                patcher = FilePatcher()
-                                                corrections = []
-                                                
-                                                for delete in analysis.get("lines_to_delete", []):
-                                                    corrections.append({
-                                                        "line_number": delete["line_number"],
-                                                        "new_code": ""
-                                                    })
-                                                
-                                                for add in analysis.get("lines_to_add", []):
-                                                    corrections.append({
-                                                        "line_number": add["line_number"],
-                                                        "new_code": add["content"]
-                                                    })
-                                                
-                                                fix_result = patcher.apply_corrections(script_path, corrections)
-                                                
-                                                if fix_result["success"]:
-                                                    st.success(f"Applied {fix_result['applied_count']} correction(s)")
-                                                    st.caption(f"Backup: {fix_result['backup_path']}")
-                                                    
-                                                    # Re-execute to verify
-                                                    st.info("Re-running script to verify...")
-                                                    verification = execute_script(script_path)
-                                                    
-                                                    if verification["success"]:
-                                                        st.success("Script now works!")
-                                                        if verification["stdout"]:
-                                                            st.code(verification["stdout"], language="text")
-                                                    else:
-                                                        st.warning("Script still has errors")
-                                                        st.code(verification["stderr"], language="text")
-                                                else:
-                                                    st.error("Failed to apply corrections")
-                                            except Exception as e:
-                                                st.error(f"Error: {e}")
-                                else:
-                                    st.warning("Issue is external to code")
-                                    st.info(analysis["not_related_to_code"])
-                        
-                        except Exception as e:
-                            st.error(f"Debugging error: {e}")
+        _debug_tab(st.session_state.env_info.get("python_files", []), project_path)
     
     with tab2:
         st.subheader("Environment Details")
@@ -309,20 +433,6 @@ else:
                 st.caption("No requirements.txt")
     
     with tab3:
-        st.subheader("Settings")
-        
-        st.markdown("**API Configuration**")
-        
-        env_key = os.getenv("GROQ_API_KEY")
-        if env_key:
-            st.success("GROQ_API_KEY is loaded from .env")
-        else:
-            groq_key = st.text_input(
-                "Enter Groq API Key",
-                type="password",
-                help="Your Groq API key"
-            )
-            if st.button("Save API Key"):
-                st.info("API key will be used for this session")
+        _settings_tab()
 
 st.divider()
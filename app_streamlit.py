@@ -3,12 +3,12 @@ Interface Streamlit pour l'agent de debugging automatique.
 Détecte automatiquement l'environnement du projet et permet de débugger des scripts Python.
 """
 import streamlit as st
-import sys
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from agent.main import DebugAgent
-from agent.env_detector import EnvironmentDetector
+
+# agent.main et agent.env_detector (client Groq, httpx, pydantic...) ne sont
+# importés qu'au premier besoin, pour accélérer le premier affichage
 
 load_dotenv()
 
@@ -20,7 +20,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-st.markdown("""
+# CSS réémis à chaque exécution (Streamlit retire les éléments non réémis) ;
+# st.html, quand il existe, l'envoie tel quel, sans passer par le rendu Markdown
+_CSS = """
     <style>
     .main-header {
         font-size: 1.75rem;
@@ -85,7 +87,174 @@ st.markdown("""
         font-size: 0.875rem;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+if hasattr(st, "html"):
+    st.html(_CSS)
+else:
+    st.markdown(_CSS, unsafe_allow_html=True)
+
+
+# Au-delà, la liste des fichiers est affichée dans un tableau (virtualisé)
+# plutôt que dans un selectbox, qui envoie toutes les options au navigateur
+FILE_SELECTBOX_MAX = 200
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+# Les widgets d'un fragment ne relancent que lui (Streamlit >= 1.33 ;
+# experimental_fragment avant, exécution normale sinon)
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def _detect_env(project_path: str) -> dict:
+    """
+    Détecte l'environnement (à chaque clic : un fichier ajouté dans un
+    sous-répertoire ne change pas le mtime de la racine).
+    
+    Les fichiers Python sont triés du plus récemment modifié au plus ancien,
+    dans un tuple : options des widgets, hachées à chaque exécution.
+    """
+    from agent.env_detector import EnvironmentDetector
+    
+    env = EnvironmentDetector(Path(project_path)).detect_all()
+    root = Path(project_path)
+    env["python_files"] = tuple(sorted(env["python_files"], key=lambda name: _mtime(root / name), reverse=True))
+    return env
+
+
+@st.cache_resource(show_spinner=False)
+def _get_agent(api_key: str):
+    """Agent partagé entre les exécutions du script (et son client Groq avec lui)."""
+    from agent.main import DebugAgent
+    
+    return DebugAgent(groq_api_key=api_key)
+
+
+def _groq_api_key():
+    return os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY", None) or st.session_state.get("groq_api_key")
+
+
+def _select_file(python_files):
+    """Sélection du fichier à débugger : selectbox, ou tableau pour les gros projets."""
+    if len(python_files) > FILE_SELECTBOX_MAX:
+        st.caption("Select a Python file to debug (most recently modified first)")
+        try:
+            event = st.dataframe(
+                {"file": python_files},
+                on_select="rerun",
+                selection_mode="single-row",
+                hide_index=True,
+                use_container_width=True,
+                key="file_table"
+            )
+        except TypeError:
+            # Streamlit < 1.35 : pas de sélection dans st.dataframe
+            pass
+        else:
+            rows = event.selection.rows
+            return python_files[rows[0]] if rows else None
+    return st.selectbox(
+        "Select a Python file to debug",
+        options=python_files,
+        help="Choose a Python script from your project"
+    )
+
+
+def _clear_debug_result():
+    st.session_state.debug_result = None
+
+
+@_fragment
+def _render_debug_result():
+    """Résultats du debug ; leurs boutons ne relancent que ce fragment."""
+    if st.session_state.debug_result:
+        result = st.session_state.debug_result
+        
+        if result["success"]:
+            if not result.get("needs_fixing"):
+                st.markdown('<div class="success-box"><b>Success:</b> Script executed without errors</div>', unsafe_allow_html=True)
+                
+                if result["execution"].get("stdout"):
+                    st.caption("Output")
+                    st.code(result["execution"]["stdout"], language="text")
+            else:
+                st.markdown('<div class="error-box"><b>Error detected in script</b></div>', unsafe_allow_html=True)
+                
+                # Afficher l'erreur
+                with st.expander("Error Details", expanded=True):
+                    st.code(result["execution"]["stderr"], language="text")
+                
+                # Analyse de l'IA
+                analysis = result["analysis"]
+                
+                st.subheader("AI Analysis")
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.caption(f"Error Type: `{analysis['error_type']}`")
+                with col2:
+                    st.caption(f"Can Fix: {'Yes' if analysis['is_code_bug'] else 'No'}")
+                
+                st.text("Analysis:")
+                st.info(analysis["analysis"])
+                
+                if analysis["is_code_bug"]:
+                    # Corrections proposées, rendues en un seul appel
+                    # (chaque st.markdown passe par le rendu Markdown)
+                    parts = ["**Proposed Corrections**\n"]
+                    for key, title in (("lines_to_delete", "Lines to Delete"), ("lines_to_add", "Lines to Add")):
+                        if analysis.get(key):
+                            parts.append(f"*{title}:*\n")
+                            for item in analysis[key]:
+                                parts.append(f"- Line **{item['line_number']}**: `{item['content']}`  \n  _{item['explanation']}_")
+                            parts.append("")
+                    st.markdown("\n".join(parts))
+                    
+                    # Bouton pour appliquer les corrections
+                    st.divider()
+                    col1, col2, col3 = st.columns([1, 1, 2])
+                    
+                    with col1:
+                        if st.button("Apply Fixes", type="primary", use_container_width=True):
+                            with st.spinner("Applying corrections..."):
+                                try:
+                                    # Le bouton relance le fragment :
+                                    # l'agent est repris du cache
+                                    agent = _get_agent(_groq_api_key())
+                                    fix_result = agent.apply_fixes(result)
+                                    
+                                    if fix_result["success"]:
+                                        st.success(f"Applied {fix_result['applied_count']} corrections")
+                                        
+                                        # Ré-exécuter
+                                        st.info("Re-running script to verify...")
+                                        verification = agent.executor.execute(result["script_path"])
+                                        
+                                        if verification["success"]:
+                                            st.success("Script now runs successfully")
+                                            if verification["stdout"]:
+                                                st.code(verification["stdout"], language="text")
+                                        else:
+                                            st.warning("Script still has errors:")
+                                            st.code(verification["stderr"], language="text")
+                                    else:
+                                        st.error(f"Failed to apply corrections: {fix_result['message']}")
+                                except Exception as e:
+                                    st.error(f"Error applying fixes: {e}")
+                    
+                    with col2:
+                        # Effacé dans le callback, avant que le fragment ne se
+                        # réaffiche : inutile de relancer toute la page
+                        st.button("Debug Again", use_container_width=True, on_click=_clear_debug_result)
+                else:
+                    st.warning(analysis.get("not_related_to_code", "Issue not related to code"))
+        else:
+            st.error(f"Error: {result.get('error', 'Unknown error')}")
+
 
 # Initialiser le state
 if 'env_detected' not in st.session_state:
@@ -94,6 +263,8 @@ if 'env_info' not in st.session_state:
     st.session_state.env_info = None
 if 'debug_result' not in st.session_state:
     st.session_state.debug_result = None
+if 'initial_cwd' not in st.session_state:
+    st.session_state.initial_cwd = str(Path.cwd())
 
 st.markdown('<div class="main-header">Automatic Debug Agent</div>', unsafe_allow_html=True)
 st.markdown('<div class="subtitle">AI-powered Python debugging with automatic environment detection</div>', unsafe_allow_html=True)
@@ -104,16 +275,14 @@ with st.sidebar:
     
     project_path = st.text_input(
         "Project Path",
-        value=str(Path.cwd()),
+        value=st.session_state.initial_cwd,
         help="Path to your Python project"
     )
     
     if st.button("Detect Environment", type="primary", use_container_width=True):
         with st.spinner("Detecting..."):
             try:
-                detector = EnvironmentDetector(Path(project_path))
-                env_info = detector.detect_all()
-                st.session_state.env_info = env_info
+                st.session_state.env_info = _detect_env(project_path)
                 st.session_state.env_detected = True
                 st.success("Environment detected")
             except Exception as e:
@@ -181,7 +350,7 @@ else:
         st.subheader("Debug Your Script")
         
         env = st.session_state.env_info
-        python_files = env.get("python_files", [])
+        python_files = env.get("python_files", ())
         
         if not python_files:
             st.warning("No Python files found in the project")
@@ -190,11 +359,7 @@ else:
             col1, col2 = st.columns([3, 1])
             
             with col1:
-                selected_file = st.selectbox(
-                    "Select a Python file to debug",
-                    options=python_files,
-                    help="Choose a Python script from your project"
-                )
+                selected_file = _select_file(python_files)
             
             with col2:
                 st.write("")
@@ -204,103 +369,21 @@ else:
             if debug_button and selected_file:
                 script_path = Path(project_path) / selected_file
                 
-                groq_api_key = os.getenv("GROQ_API_KEY") or st.secrets.get("GROQ_API_KEY", None) or st.session_state.get("groq_api_key")
+                groq_api_key = _groq_api_key()
                 
                 if not groq_api_key:
                     st.error("GROQ_API_KEY not found. Please add it in .env file or Settings tab.")
                 else:
                     with st.spinner(f"Debugging {selected_file}..."):
                         try:
-                            agent = DebugAgent(groq_api_key=groq_api_key)
+                            agent = _get_agent(groq_api_key)
                             result = agent.debug(str(script_path))
                             st.session_state.debug_result = result
                         except Exception as e:
                             st.error(f"Error during debugging: {e}")
             
             # Afficher les résultats
-            if st.session_state.debug_result:
-                result = st.session_state.debug_result
-                
-                if result["success"]:
-                    if not result.get("needs_fixing"):
-                        st.markdown('<div class="success-box"><b>Success:</b> Script executed without errors</div>', unsafe_allow_html=True)
-                        
-                        if result["execution"].get("stdout"):
-                            st.markdown("**Output**")
-                            st.code(result["execution"]["stdout"], language="text")
-                    else:
-                        st.markdown('<div class="error-box"><b>Error detected in script</b></div>', unsafe_allow_html=True)
-                        
-                        # Afficher l'erreur
-                        with st.expander("Error Details", expanded=True):
-                            st.code(result["execution"]["stderr"], language="text")
-                        
-                        # Analyse de l'IA
-                        analysis = result["analysis"]
-                        
-                        st.markdown("**AI Analysis**")
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.caption(f"Error Type: `{analysis['error_type']}`")
-                        with col2:
-                            st.caption(f"Can Fix: {'Yes' if analysis['is_code_bug'] else 'No'}")
-                        
-                        st.markdown("**Analysis:**")
-                        st.info(analysis["analysis"])
-                        
-                        if analysis["is_code_bug"]:
-                            # Corrections proposées
-                            st.markdown("**Proposed Corrections**")
-                            
-                            if analysis.get("lines_to_delete"):
-                                st.markdown("*Lines to Delete:*")
-                                for item in analysis["lines_to_delete"]:
-                                    st.markdown(f"- Line **{item['line_number']}**: `{item['content']}`")
-                                    st.caption(f"  {item['explanation']}")
-                            
-                            if analysis.get("lines_to_add"):
-                                st.markdown("*Lines to Add:*")
-                                for item in analysis["lines_to_add"]:
-                                    st.markdown(f"- Line **{item['line_number']}**: `{item['content']}`")
-                                    st.caption(f"  {item['explanation']}")
-                            
-                            # Bouton pour appliquer les corrections
-                            st.divider()
-                            col1, col2, col3 = st.columns([1, 1, 2])
-                            
-                            with col1:
-                                if st.button("Apply Fixes", type="primary", use_container_width=True):
-                                    with st.spinner("Applying corrections..."):
-                                        try:
-                                            fix_result = agent.apply_fixes(result)
-                                            
-                                            if fix_result["success"]:
-                                                st.success(f"Applied {fix_result['applied_count']} corrections")
-                                                
-                                                # Ré-exécuter
-                                                st.info("Re-running script to verify...")
-                                                verification = agent.executor.execute(result["script_path"])
-                                                
-                                                if verification["success"]:
-                                                    st.success("Script now runs successfully")
-                                                    if verification["stdout"]:
-                                                        st.code(verification["stdout"], language="text")
-                                                else:
-                                                    st.warning("Script still has errors:")
-                                                    st.code(verification["stderr"], language="text")
-                                            else:
-                                                st.error(f"Failed to apply corrections: {fix_result['message']}")
-                                        except Exception as e:
-                                            st.error(f"Error applying fixes: {e}")
-                            
-                            with col2:
-                                if st.button("Debug Again", use_container_width=True):
-                                    st.session_state.debug_result = None
-                                    st.rerun()
-                        else:
-                            st.warning(analysis.get("not_related_to_code", "Issue not related to code"))
-                else:
-                    st.error(f"Error: {result.get('error', 'Unknown error')}")
+            _render_debug_result()
     
     with tab2:
         st.subheader("Environment Details")
@@ -366,7 +449,7 @@ else:
             
             # Python Files
             st.markdown("**Python Files**")
-            files = env.get("python_files", [])
+            files = env.get("python_files", ())
             st.caption(f"Found {len(files)} Python files")
             
             if files:
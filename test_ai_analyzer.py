@@ -0,0 +1,68 @@
+"""
+Tests de l'extraction du JSON des réponses du modèle (sans appel à l'API).
+"""
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "agent"))
+
+from ai_analyzer import _JsonObjectScanner, _extract_json, _read_json_stream, _repair_budget
+
+
+def _chunk(text, finish_reason=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=finish_reason)])
+
+
+class _Stream(list):
+    closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+class JsonObjectScannerTest(unittest.TestCase):
+    def test_end_of_outer_object(self):
+        text = 'Voici : {"a": {"b": 1}} et la suite'
+        self.assertEqual(text[:_JsonObjectScanner().feed(text)], 'Voici : {"a": {"b": 1}}')
+    
+    def test_braces_and_escaped_quotes_inside_strings(self):
+        text = '{"code": "print(\\"}\\") {", "n": 1}'
+        self.assertEqual(_JsonObjectScanner().feed(text), len(text))
+    
+    def test_object_split_across_chunks(self):
+        scanner = _JsonObjectScanner()
+        self.assertEqual(scanner.feed('{"a": "x\\'), -1)
+        self.assertEqual(scanner.feed('"}'), -1)
+        self.assertEqual(scanner.feed('"}\n```'), 2)
+    
+    def test_no_object(self):
+        self.assertEqual(_JsonObjectScanner().feed("pas de JSON"), -1)
+
+
+class ExtractJsonTest(unittest.TestCase):
+    def test_fenced_answer(self):
+        self.assertEqual(_extract_json('```json\n{"delete": []}\n```'), {"delete": []})
+    
+    def test_invalid_answer(self):
+        with self.assertRaises(ValueError):
+            _extract_json('{"delete": [')
+
+
+class ReadJsonStreamTest(unittest.TestCase):
+    def test_stops_after_the_object(self):
+        stream = _Stream([_chunk('{"a": '), _chunk('1} reste'), _chunk("jamais lu")])
+        self.assertEqual(_read_json_stream(stream), ('{"a": 1}', None))
+        self.assertTrue(stream.closed)
+    
+    def test_reports_a_cut_off_answer(self):
+        stream = _Stream([_chunk('{"a": "tron'), _chunk("", "length")])
+        content, finish_reason = _read_json_stream(stream)
+        self.assertEqual(finish_reason, "length")
+        self.assertEqual(_repair_budget(300, finish_reason), 600)
+        self.assertEqual(_repair_budget(300, "stop"), 300)
+
+
+if __name__ == "__main__":
+    unittest.main()
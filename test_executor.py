@@ -0,0 +1,184 @@
+"""
+Tests de l'exécution des scripts : exécution à chaud (PersistentRunner)
+identique à une exécution directe, limites de sortie et de durée,
+numérotation des sources.
+"""
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "agent"))
+
+import executor
+from executor import execute_in_process, execute_script, get_numbered_source
+
+SCRIPTS = {
+    "ok.py": """
+        print("bonjour")
+    """,
+    "error.py": """
+        def f():
+            return 1 / 0
+        print("avant")
+        f()
+    """,
+    "exit_code.py": """
+        import sys
+        sys.exit(3)
+    """,
+    "exit_message.py": """
+        raise SystemExit("message")
+    """,
+    "atexit_handler.py": """
+        import atexit
+        atexit.register(lambda: print("atexit ran"))
+        print("main")
+    """,
+    "handled.py": """
+        import traceback
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            traceback.print_exc()
+        print("suite")
+    """,
+    "cwd_argv.py": """
+        import os, sys
+        print(os.path.basename(os.getcwd()), os.path.basename(sys.argv[0]))
+    """,
+    "buffering.py": """
+        import sys
+        print(sys.stdout.line_buffering, sys.stdout.write_through)
+    """,
+    "flood.py": """
+        for i in range(5000):
+            print(i)
+        raise ValueError("fin")
+    """,
+    "syntax_error.py": """
+        print("ok"
+    """,
+    "loop.py": """
+        while True:
+            pass
+    """,
+}
+
+
+class ExecutorTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.dir = Path(cls.tmp.name) / "scripts"
+        cls.dir.mkdir()
+        for name, source in SCRIPTS.items():
+            (cls.dir / name).write_text(textwrap.dedent(source).lstrip(), encoding="utf-8")
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "le runner à chaud nécessite fork")
+class WarmRunnerTest(ExecutorTestCase):
+    def assert_same_run(self, name):
+        env = {k: v for k, v in os.environ.items() if k != "PYTHONUNBUFFERED"}
+        with mock.patch.dict(os.environ, env, clear=True):
+            # Runners started under another environment would not match
+            executor._close_runners()
+            cold = execute_script(self.dir / name)
+            warm = execute_script(self.dir / name, warm=True)
+        self.assertEqual(warm, cold)
+        return cold
+    
+    def test_success(self):
+        self.assertEqual(self.assert_same_run("ok.py")["stdout"], "bonjour\n")
+    
+    def test_traceback_without_runpy_frames(self):
+        result = self.assert_same_run("error.py")
+        self.assertFalse(result["success"])
+        self.assertNotIn("runpy", result["traceback"])
+    
+    def test_exit_codes(self):
+        self.assertFalse(self.assert_same_run("exit_code.py")["success"])
+        self.assertEqual(self.assert_same_run("exit_message.py")["stderr"], "message\n")
+    
+    def test_atexit_handlers_run(self):
+        self.assertEqual(self.assert_same_run("atexit_handler.py")["stdout"], "main\natexit ran\n")
+    
+    def test_handled_traceback_is_not_a_failure(self):
+        self.assertTrue(self.assert_same_run("handled.py")["success"])
+    
+    def test_cwd_argv_and_buffering(self):
+        self.assert_same_run("cwd_argv.py")
+        self.assert_same_run("buffering.py")
+    
+    def test_output_bounds(self):
+        with mock.patch.object(executor, "OUTPUT_MAX_LINES", 100):
+            result = self.assert_same_run("flood.py")
+        self.assertTrue(result["stdout"].startswith("...[truncated]...\n"))
+        self.assertEqual(result["stdout"].count("\n"), 101)
+
+
+class TimeoutTest(ExecutorTestCase):
+    def test_cold_and_warm(self):
+        with mock.patch.object(executor, "SCRIPT_TIMEOUT", 0.5):
+            for warm in (False, True):
+                result = execute_script(self.dir / "loop.py", warm=warm)
+                self.assertFalse(result["success"])
+                self.assertEqual(result["stderr"], "TIMEOUT after 0.5s")
+    
+    def test_in_process(self):
+        cwd, argv = os.getcwd(), list(sys.argv)
+        with mock.patch.object(executor, "SCRIPT_TIMEOUT", 0.5):
+            result = execute_in_process(self.dir / "loop.py")
+        self.assertEqual(result["stderr"], "TIMEOUT after 0.5s")
+        self.assertEqual((os.getcwd(), sys.argv), (cwd, argv))
+        self.assertEqual(execute_in_process(self.dir / "atexit_handler.py")["stdout"], "main\natexit ran\n")
+
+
+class SyntaxCheckTest(ExecutorTestCase):
+    def test_reported_with_or_without_the_pre_check(self):
+        for same_version in (True, False):
+            with mock.patch.object(executor, "_runs_host_version", return_value=same_version):
+                result = execute_script(self.dir / "syntax_error.py")
+            self.assertFalse(result["success"])
+            self.assertIn("SyntaxError", result["traceback"])
+    
+    def test_other_interpreter_version_skips_the_pre_check(self):
+        with mock.patch.object(executor.shutil, "which", return_value="/autre/python"), \
+                mock.patch.object(executor, "_python_version", return_value=(2, 7)), \
+                mock.patch.object(executor.os, "stat"):
+            self.assertFalse(executor._runs_host_version())
+
+
+class NumberedSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "script.py"
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_numbers_match_python_lines(self):
+        # Form feed and U+2028 do not end a line for Python
+        self.path.write_text('x = 1\n\fy = 2\nz = "a\u2028b"\nprint(z)\n', encoding="utf-8")
+        numbered = get_numbered_source(self.path)
+        self.assertEqual(numbered.split("\n")[3], "  4 | print(z)")
+    
+    def test_large_file_excerpt(self):
+        self.path.write_text("x = 1\n" * 1000 + "raise ValueError\n", encoding="utf-8")
+        traceback = f'  File "{self.path}", line 1001, in <module>\n'
+        with mock.patch.object(executor, "SOURCE_MAX_BYTES", 100):
+            self.assertTrue(get_numbered_source(self.path).startswith("[too large"))
+            excerpt = get_numbered_source(self.path, traceback)
+        self.assertIn("1001 | raise ValueError", excerpt)
+        self.assertIn("# ... L31-L970 omitted ...", excerpt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Tests de FilePatcher (remplacement de lignes au niveau des octets).
+"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "agent"))
+
+from file_patcher import FilePatcher, corrections_from_analysis
+
+
+class FilePatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.script = Path(self.tmp.name) / "script.py"
+        self.patcher = FilePatcher()
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def patch(self, data, corrections):
+        self.script.write_bytes(data)
+        return self.patcher.apply_corrections(self.script, corrections)
+    
+    def test_replaces_lines_and_keeps_others_byte_for_byte(self):
+        result = self.patch(b"a = 1\r\nb = 2\r\nc = 3", [{"line_number": 2, "new_code": "b = 20"}])
+        self.assertTrue(result["changed"])
+        self.assertEqual(result["applied_count"], 1)
+        self.assertEqual(self.script.read_bytes(), b"a = 1\r\nb = 20\nc = 3")
+    
+    def test_last_line_without_newline(self):
+        self.patch(b"a\nb", [{"line_number": 2, "new_code": "B"}])
+        self.assertEqual(self.script.read_bytes(), b"a\nB\n")
+    
+    def test_unsorted_corrections_are_all_applied(self):
+        self.patch(b"a\nb\nc\n", [{"line_number": 3, "new_code": "C"}, {"line_number": 1, "new_code": "A"}])
+        self.assertEqual(self.script.read_bytes(), b"A\nb\nC\n")
+    
+    def test_last_correction_for_a_line_wins(self):
+        self.patch(b"a\nb\n", [{"line_number": 1, "new_code": ""}, {"line_number": 1, "new_code": "A"}])
+        self.assertEqual(self.script.read_bytes(), b"A\nb\n")
+    
+    def test_out_of_range_lines_are_ignored(self):
+        self.patch(b"a\n", [{"line_number": 0, "new_code": "x"}, {"line_number": 5, "new_code": "y"}])
+        self.assertEqual(self.script.read_bytes(), b"a\n")
+    
+    def test_unchanged_content_is_not_rewritten(self):
+        result = self.patch(b"a\nb\n", [{"line_number": 2, "new_code": "b"}])
+        self.assertFalse(result["changed"])
+        self.assertIsNone(result["backup_path"])
+        self.assertFalse(self.script.with_suffix(".py.bak").exists())
+    
+    def test_no_corrections(self):
+        result = self.patch(b"a\n", [])
+        self.assertEqual(result, {"success": True, "applied_count": 0, "changed": False, "backup_path": None})
+    
+    def test_backup_keeps_the_original_content(self):
+        result = self.patch(b"a\nb\n", [{"line_number": 1, "new_code": "A"}])
+        self.assertEqual(Path(result["backup_path"]).read_bytes(), b"a\nb\n")
+        self.assertEqual(self.script.read_bytes(), b"A\nb\n")
+        self.assertFalse(self.script.with_suffix(".py.tmp").exists())
+    
+    def test_keeps_the_file_mode(self):
+        self.script.write_bytes(b"a\n")
+        os.chmod(self.script, 0o750)
+        self.patcher.apply_corrections(self.script, [{"line_number": 1, "new_code": "A"}])
+        self.assertEqual(self.script.stat().st_mode & 0o777, 0o750)
+
+
+class CorrectionsFromAnalysisTest(unittest.TestCase):
+    def test_additions_after_deletions(self):
+        analysis = {
+            "lines_to_delete": [{"line_number": 3}, {"line_number": 1}],
+            "lines_to_add": [{"line_number": 3, "content": "C"}]
+        }
+        self.assertEqual(corrections_from_analysis(analysis), [
+            {"line_number": 3, "new_code": ""},
+            {"line_number": 1, "new_code": ""},
+            {"line_number": 3, "new_code": "C"}
+        ])
+    
+    def test_addition_wins_over_deletion_of_the_same_line(self):
+        analysis = {
+            "lines_to_delete": [{"line_number": 2}],
+            "lines_to_add": [{"line_number": 2, "content": "B"}]
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            script = Path(tmp) / "script.py"
+            script.write_bytes(b"a\nb\n")
+            FilePatcher().apply_corrections(script, corrections_from_analysis(analysis))
+            self.assertEqual(script.read_bytes(), b"a\nB\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
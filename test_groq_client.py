@@ -0,0 +1,51 @@
+"""
+Tests des appels à Groq (limitation de débit, délais entre tentatives),
+sans accès réseau.
+"""
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "agent"))
+
+import groq_client
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_request_limit(self):
+        limiter = groq_client._RateLimiter(rpm=2, tpm=0)
+        self.assertEqual(limiter._reserve(10), 0)
+        self.assertEqual(limiter._reserve(10), 0)
+        self.assertGreater(limiter._reserve(10), 59)
+    
+    def test_token_limit(self):
+        limiter = groq_client._RateLimiter(rpm=0, tpm=100)
+        self.assertEqual(limiter._reserve(60), 0)
+        self.assertGreater(limiter._reserve(60), 59)
+        self.assertEqual(limiter._reserve(40), 0)
+    
+    def test_window_slides(self):
+        limiter = groq_client._RateLimiter(rpm=1, tpm=0)
+        with mock.patch.object(groq_client.time, "monotonic", return_value=1000.0):
+            self.assertEqual(limiter._reserve(1), 0)
+        with mock.patch.object(groq_client.time, "monotonic", return_value=1061.0):
+            self.assertEqual(limiter._reserve(1), 0)
+
+
+class RetryDelayTest(unittest.TestCase):
+    def test_retry_after_header(self):
+        error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "7"}))
+        self.assertEqual(groq_client._retry_delay(error, 0), 7.0)
+    
+    def test_jittered_backoff(self):
+        error = SimpleNamespace(response=SimpleNamespace(headers={}))
+        for attempt in range(6):
+            delay = groq_client._retry_delay(error, attempt)
+            self.assertGreaterEqual(delay, groq_client.BACKOFF_MIN)
+            self.assertLessEqual(delay, groq_client.BACKOFF_MAX)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests du cache disque des réponses du modèle.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "agent"))
+
+import llm_cache
+
+
+class LlmCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(llm_cache, "CACHE_DIR", Path(self.tmp.name) / "cache")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+    
+    def test_round_trip(self):
+        key = llm_cache.make_key("prompt", "code", "modèle")
+        llm_cache.put(key, {"analysis": "é"})
+        self.assertEqual(llm_cache.get(key), {"analysis": "é"})
+        self.assertEqual(os.listdir(llm_cache.CACHE_DIR), [f"{key}.json"])
+    
+    def test_concurrent_writers_of_one_key(self):
+        key = llm_cache.make_key("z")
+        threads = [threading.Thread(target=llm_cache.put, args=(key, {"n": n})) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(llm_cache.get(key), [{"n": n} for n in range(8)])
+        self.assertEqual(os.listdir(llm_cache.CACHE_DIR), [f"{key}.json"])
+    
+    def test_failed_write_leaves_no_temporary_file(self):
+        key = llm_cache.make_key("w")
+        with mock.patch.object(llm_cache.os, "replace", side_effect=OSError):
+            llm_cache.put(key, {"a": 1})
+        self.assertEqual(os.listdir(llm_cache.CACHE_DIR), [])
+    
+    def test_keys_separate_parts(self):
+        self.assertNotEqual(llm_cache.make_key("ab", "c"), llm_cache.make_key("a", "bc"))
+    
+    def test_expired_entry_is_a_miss(self):
+        key = llm_cache.make_key("x")
+        llm_cache.put(key, {"a": 1})
+        old = time.time() - llm_cache.TTL_SECONDS - 10
+        os.utime(llm_cache.CACHE_DIR / f"{key}.json", (old, old))
+        self.assertIsNone(llm_cache.get(key))
+    
+    def test_corrupt_entry_is_a_miss(self):
+        key = llm_cache.make_key("y")
+        llm_cache.CACHE_DIR.mkdir(parents=True)
+        (llm_cache.CACHE_DIR / f"{key}.json").write_bytes(b'{"a": ')
+        self.assertIsNone(llm_cache.get(key))
+
+
+if __name__ == "__main__":
+    unittest.main()